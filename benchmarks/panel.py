@@ -0,0 +1,157 @@
+# 📁 benchmarks/panel.py
+"""Panel scaling: thread-per-fetch vs one event loop, on a single core.
+
+    python -m benchmarks.panel                        # 10, 100 and 1,000 genes
+    python -m benchmarks.panel --genes 1000 --latency 0.2 --host-concurrency 200
+
+Both runs fetch every source for every gene from benchmarks.replay, which
+answers each request after --latency seconds to stand in for the network.
+The threaded run is utils.panel.run_panel (a ThreadPoolExecutor of --workers
+threads over the sync fetchers, with Open Targets in batched documents); the
+async run is utils.panel.run_panel_async.
+Rate limits are off, but the per-host connection caps stay on for both, so
+--host-concurrency decides how much upstream parallelism either one may use.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Isolated caches and the live upstreams, whatever the environment says
+os.environ["G2T_CACHE_DIR"] = tempfile.mkdtemp(prefix="g2t-bench-")
+for name in ("G2T_OT_STORE", "G2T_TRIAL_INDEX", "G2T_CACHE_BACKEND", "G2T_METRICS_LOG"):
+    os.environ.pop(name, None)
+
+import pandas as pd  # noqa: E402
+
+from benchmarks.replay import ReplayAdapter  # noqa: E402
+from utils import async_http, http_client  # noqa: E402
+from utils.cache import MemoryBackend, set_backend  # noqa: E402
+from utils.lookup import SOURCES  # noqa: E402
+from utils.panel import MAX_WORKERS, run_panel, run_panel_async  # noqa: E402
+
+PANEL_SIZES = [10, 100, 1000]
+RECORDS = 20
+LATENCY = 0.05
+
+
+def panel(size):
+    """`size` distinct made-up gene symbols; replay answers every symbol alike."""
+    return [f"GENE{i}" for i in range(size)]
+
+
+def run_threads(genes, sources, workers):
+    results = run_panel(genes, sources=sources, max_workers=workers)
+    return len(results["errors"])
+
+
+def run_async(genes, sources):
+    results = asyncio.run(run_panel_async(genes, sources=sources))
+    return len(results["errors"])
+
+
+class ThreadSampler:
+    """Track the most threads alive at once while a run is going."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        # The sampler itself is not part of the run
+        self.peak -= 1
+
+
+def bench(mode, size, sources, workers):
+    genes = panel(size)
+    with ThreadSampler() as threads:
+        started = time.perf_counter()
+        if mode == "threads":
+            failed = run_threads(genes, sources, workers)
+        else:
+            failed = run_async(genes, sources)
+        wall = time.perf_counter() - started
+
+    fetches = size * len(sources)
+    return {
+        "mode": mode,
+        "genes": size,
+        "fetches": fetches,
+        "failed": failed,
+        "wall_s": round(wall, 2),
+        "genes_per_s": round(size / wall, 1),
+        "fetches_per_s": round(fetches / wall, 1),
+        "peak_threads": threads.peak,
+    }
+
+
+def pin_to_one_core():
+    """Run on one CPU where the OS lets us, so threads cannot win by using more cores."""
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {min(os.sched_getaffinity(0))})
+        return True
+    return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Threaded vs asyncio gene panel throughput.")
+    parser.add_argument("--genes", type=int, nargs="+", default=PANEL_SIZES, help="panel sizes to run")
+    parser.add_argument("--sources", nargs="+", choices=list(SOURCES), default=list(SOURCES))
+    parser.add_argument("--records", type=int, default=RECORDS, help="results per source and gene")
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds per replayed response")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="threads for the threaded run")
+    parser.add_argument(
+        "--host-concurrency", type=int,
+        help="override every upstream's max in-flight requests (default: the polite limits in http_client)"
+    )
+    parser.add_argument("--modes", nargs="+", choices=["threads", "async"], default=["threads", "async"])
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    pinned = pin_to_one_core()
+    print("Pinned to one core" if pinned else "Could not pin to one core; numbers include every CPU")
+
+    if args.host_concurrency:
+        for config in [*http_client.HOSTS.values(), http_client.DEFAULT_HOST]:
+            config["max_concurrency"] = args.host_concurrency
+
+    # Nothing may come from the response cache: every run does the full work
+    set_backend(MemoryBackend(max_entries=0))
+
+    replay = ReplayAdapter(args.records, latency=args.latency)
+    http_client.install_adapter(replay, rate_limits=False)
+    async_http.install_transport(replay.async_transport(), rate_limits=False)
+    try:
+        results = [
+            bench(mode, size, args.sources, args.workers)
+            for size in args.genes
+            for mode in args.modes
+        ]
+    finally:
+        http_client.install_adapter(None)
+        async_http.install_transport(None)
+
+    df = pd.DataFrame(results)
+    print(df.to_string(index=False))
+    if args.json:
+        df.to_json(args.json, orient="records", indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+# 📁 benchmarks/replay.py
+"""Requests transport adapters that replay (or record) upstream responses.
+
+One fixture per endpoint lives in benchmarks/fixtures/, in the exact format
+the upstream returns. ReplayAdapter answers every request from those files,
+tiling their records to whatever result size the benchmark asks for and
+honouring each API's own paging (MyVariant scroll ids, Open Targets page
+index/size, ClinicalTrials.gov page tokens, PubMed retstart/retmax), so the
+client code walks the same number of pages it would against the live API.
+"""
+import asyncio
+import copy
+import io
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+FIXTURES = {
+    "myvariant": "myvariant.json",
+    "opentargets_search": "opentargets_search.json",
+    "opentargets_diseases": "opentargets_diseases.json",
+    "opentargets_drugs": "opentargets_drugs.json",
+    "clinicaltrials": "clinicaltrials.json",
+    "pubmed_esearch": "pubmed_esearch.json",
+    "pubmed_efetch": "pubmed_efetch.xml",
+}
+
+MYVARIANT_SCROLL = 1000
+
+_ARTICLE = re.compile(rb"<PubmedArticle>.*?</PubmedArticle>", re.S)
+_DISEASE_PAGE = re.compile(r"associatedDiseases\(page: \{index: (\d+), size: (\d+)\}\)")
+
+
+def fixture_name(url, body=None):
+    """Which fixture answers this request, or None for endpoints we do not replay."""
+    parts = urlsplit(url)
+    host, path = parts.hostname, parts.path
+    if host == "myvariant.info":
+        return "myvariant"
+    if host == "clinicaltrials.gov":
+        return "clinicaltrials"
+    if host == "eutils.ncbi.nlm.nih.gov":
+        return "pubmed_esearch" if path.endswith("esearch.fcgi") else "pubmed_efetch"
+    if host == "api.platform.opentargets.org":
+        query = _json_body(body).get("query", "")
+        # utils.opentargets packs many genes into one document of aliased fields
+        if query.startswith("query batch("):
+            return "opentargets_batch"
+        if "associatedDiseases" in query:
+            return "opentargets_diseases"
+        if "drugAndClinicalCandidates" in query:
+            return "opentargets_drugs"
+        if "search(" in query:
+            return "opentargets_search"
+    return None
+
+
+def _json_body(body):
+    try:
+        return json.loads(body or b"{}")
+    except ValueError:
+        return {}
+
+
+def _raw_response(body, content_type, status=200):
+    return HTTPResponse(
+        body=io.BytesIO(body),
+        headers={"Content-Type": content_type, "Content-Length": str(len(body))},
+        status=status,
+        preload_content=False,
+        decode_content=False,
+    )
+
+
+class ReplayAdapter(HTTPAdapter):
+    """Serve every request from the fixtures, as if the upstream had `records` results.
+
+    Mount it with http_client.install_adapter(); async_transport() serves the
+    same responses to utils.async_http.
+    """
+
+    def __init__(self, records, fixture_dir=FIXTURE_DIR, latency=0.0):
+        super().__init__()
+        self.records = records
+        self.latency = latency  # seconds each response takes, to stand in for the network
+        self.fixtures = {}
+        for name, filename in FIXTURES.items():
+            with open(os.path.join(fixture_dir, filename), "rb") as f:
+                self.fixtures[name] = f.read()
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if self.latency:
+            time.sleep(self.latency)
+        status, body, content_type = self.respond(request.url, request.body)
+        return self.build_response(request, _raw_response(body, content_type, status))
+
+    def async_transport(self):
+        """An httpx transport answering from the same fixtures, for utils.async_http."""
+        import httpx
+
+        async def handle(request):
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            status, body, content_type = self.respond(str(request.url), request.content)
+            return httpx.Response(status, content=body, headers={"Content-Type": content_type})
+
+        return httpx.MockTransport(handle)
+
+    def respond(self, url, request_body):
+        """(status, body, content type) for one request."""
+        name = fixture_name(url, request_body)
+        if name is None:
+            return 404, b"not recorded", "text/plain"
+
+        params = {k: v[0] for k, v in parse_qs(urlsplit(url).query).items()}
+        graphql = _json_body(request_body)
+        query, variables = graphql.get("query", ""), graphql.get("variables", {})
+
+        # Bodies are built once per page and reused, so repeated runs time the client only
+        key = (name, json.dumps([params, variables], sort_keys=True))
+        if name == "opentargets_batch":
+            key += (query,)
+        with self._lock:
+            body = self._bodies.get(key)
+        if body is None:
+            if name == "opentargets_batch":
+                body = self._opentargets_batch(query, variables)
+            else:
+                body = getattr(self, f"_{name}")(params, variables)
+            with self._lock:
+                self._bodies[key] = body
+
+        content_type = "text/xml" if name == "pubmed_efetch" else "application/json"
+        return 200, body, content_type
+
+    # ---------------------------------------------------
+    # Record tiling
+    # ---------------------------------------------------
+
+    def _tile(self, items, start, stop, uniquify):
+        stop = min(stop, self.records)
+        out = []
+        for i in range(start, stop):
+            item = copy.deepcopy(items[i % len(items)])
+            uniquify(item, i)
+            out.append(item)
+        return out
+
+    def _fixture_json(self, name):
+        return json.loads(self.fixtures[name])
+
+    # ---------------------------------------------------
+    # Endpoints
+    # ---------------------------------------------------
+
+    def _myvariant(self, params, variables):
+        data = self._fixture_json("myvariant")
+
+        def uniquify(hit, i):
+            hit["_id"] = f"{hit['_id']}_{i}"
+
+        if "scroll_id" in params:
+            start = int(params["scroll_id"])
+            size = MYVARIANT_SCROLL
+        elif "size" in params:
+            start, size = 0, int(params["size"])
+        else:
+            start, size = 0, MYVARIANT_SCROLL
+
+        hits = self._tile(data["hits"], start, start + size, uniquify)
+        page = {"took": 1, "total": self.records, "max_score": data.get("max_score"), "hits": hits}
+        if "size" not in params and start + size < self.records:
+            page["_scroll_id"] = str(start + size)
+        return json.dumps(page).encode()
+
+    def _opentargets_search(self, params, variables):
+        return self.fixtures["opentargets_search"]
+
+    def _opentargets_diseases(self, params, variables):
+        page = self._disease_page(variables.get("index", 0), variables.get("size", 25))
+        return json.dumps({"data": {"target": {"associatedDiseases": page}}}).encode()
+
+    def _opentargets_drugs(self, params, variables):
+        return json.dumps({"data": {"target": {"drugAndClinicalCandidates": self._drug_candidates()}}}).encode()
+
+    def _opentargets_batch(self, query, variables):
+        """A utils.opentargets document: answer each aliased field for its own variable."""
+        data = {}
+        for alias, value in variables.items():
+            if f"{alias}: search(" in query:
+                found = self._fixture_json("opentargets_search")["data"]["search"]
+                for hit in found["hits"]:
+                    target = hit["object"]
+                    if target["approvedSymbol"] != value:
+                        # Every symbol gets a target of its own, so batches are not collapsed
+                        target.update(id=f"{target['id']}_{value}", approvedSymbol=value)
+                data[alias] = found
+                continue
+
+            target = {"id": value, "approvedSymbol": value}
+            page = _DISEASE_PAGE.search(query)
+            if page:
+                target["associatedDiseases"] = self._disease_page(int(page.group(1)), int(page.group(2)))
+            if "drugAndClinicalCandidates" in query:
+                target["drugAndClinicalCandidates"] = self._drug_candidates()
+            data[alias] = target
+        return json.dumps({"data": data}).encode()
+
+    def _disease_page(self, index, size):
+        associations = self._fixture_json("opentargets_diseases")["data"]["target"]["associatedDiseases"]
+
+        def uniquify(row, i):
+            row["disease"]["id"] = f"{row['disease']['id']}_{i}"
+            # Keep rows ordered by score like the real API
+            row["score"] = round(1 - i / (self.records + 1), 6)
+
+        associations["rows"] = self._tile(associations["rows"], index * size, (index + 1) * size, uniquify)
+        associations["count"] = self.records
+        return associations
+
+    def _drug_candidates(self):
+        candidates = self._fixture_json("opentargets_drugs")["data"]["target"]["drugAndClinicalCandidates"]
+
+        def uniquify(row, i):
+            row["id"] = row["drug"]["id"] = f"{row['drug']['id']}_{i}"
+
+        candidates["rows"] = self._tile(candidates["rows"], 0, self.records, uniquify)
+        return candidates
+
+    def _clinicaltrials(self, params, variables):
+        data = self._fixture_json("clinicaltrials")
+        start = int(params.get("pageToken", 0))
+        size = int(params.get("pageSize", 10))
+
+        def uniquify(study, i):
+            study["protocolSection"]["identificationModule"]["nctId"] = f"NCT{i:08d}"
+
+        page = {"studies": self._tile(data["studies"], start, start + size, uniquify)}
+        if start + size < self.records:
+            page["nextPageToken"] = str(start + size)
+        return json.dumps(page).encode()
+
+    def _pubmed_esearch(self, params, variables):
+        data = self._fixture_json("pubmed_esearch")
+        data["esearchresult"].update({
+            "count": str(self.records), "retmax": "0", "retstart": "0",
+            "querykey": "1", "webenv": "REPLAY", "idlist": [],
+        })
+        return json.dumps(data).encode()
+
+    def _pubmed_efetch(self, params, variables):
+        xml = self.fixtures["pubmed_efetch"]
+        articles = _ARTICLE.findall(xml)
+        head = xml[:xml.index(articles[0])]
+        tail = xml[xml.rindex(articles[-1]) + len(articles[-1]):]
+        start = int(params.get("retstart", 0))
+        stop = min(start + int(params.get("retmax", 20)), self.records)
+        return head + b"\n".join(articles[i % len(articles)] for i in range(start, stop)) + tail
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Pass requests to the network and save the first response of every endpoint as its fixture."""
+
+    def __init__(self, fixture_dir=FIXTURE_DIR):
+        super().__init__()
+        self.fixture_dir = fixture_dir
+        self.recorded = set()
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        name = fixture_name(request.url, request.body)
+        # Batched documents are answered from the single-target fixtures
+        if name not in FIXTURES or response.status_code != 200:
+            return response
+
+        # Read the body once, save it, and hand the caller an unread copy
+        body = response.content
+        with self._lock:
+            if name not in self.recorded:
+                self.recorded.add(name)
+                with open(os.path.join(self.fixture_dir, FIXTURES[name]), "wb") as f:
+                    f.write(body)
+        content_type = response.headers.get("Content-Type", "application/octet-stream")
+        return self.build_response(request, _raw_response(body, content_type))
@@ -0,0 +1,176 @@
+# 📁 benchmarks/run.py
+"""Offline benchmarks of the fetch → parse → table pipeline, one per source.
+
+    python -m benchmarks.run                          # 1, 100 and 10,000 records
+    python -m benchmarks.run --save-baseline          # store this machine's numbers
+    python -m benchmarks.run --sizes 100 --sources trials literature
+    python -m benchmarks.run record TP53              # refresh fixtures from the live APIs
+
+Every HTTP call is answered by benchmarks.replay.ReplayAdapter, so runs need
+no network and are repeatable. Latency percentiles, peak traced memory and
+throughput are compared against the baseline file when one exists; any
+metric worse than the baseline by more than --tolerance fails the run.
+Baselines depend on the machine, so each machine keeps its own.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Isolated caches and the live upstreams, whatever the environment says
+os.environ["G2T_CACHE_DIR"] = tempfile.mkdtemp(prefix="g2t-bench-")
+for name in ("G2T_OT_STORE", "G2T_TRIAL_INDEX", "G2T_CACHE_BACKEND", "G2T_METRICS_LOG"):
+    os.environ.pop(name, None)
+
+import pandas as pd  # noqa: E402
+
+from benchmarks.replay import FIXTURE_DIR, RecordingAdapter, ReplayAdapter  # noqa: E402
+from utils import http_client  # noqa: E402
+from utils.cache import MemoryBackend, set_backend  # noqa: E402
+from utils.diseases import fetch_diseases  # noqa: E402
+from utils.drugs import fetch_drugs_for_gene  # noqa: E402
+from utils.mutations import fetch_mutations  # noqa: E402
+from utils.records import to_frame  # noqa: E402
+from utils.summarizer import fetch_pubmed_abstracts  # noqa: E402
+from utils.trials import fetch_clinical_trials  # noqa: E402
+
+GENE = "TP53"
+SIZES = [1, 100, 10000]
+REPEAT = 5
+TOLERANCE = 0.25
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# source → fetch(gene, records); each call asks for exactly `records` results
+FETCHERS = {
+    "mutations": lambda gene, n: fetch_mutations(gene, max_records=n),
+    "diseases": lambda gene, n: fetch_diseases(gene),
+    "drugs": lambda gene, n: fetch_drugs_for_gene(gene),
+    "trials": lambda gene, n: fetch_clinical_trials(gene, max_records=n),
+    "literature": lambda gene, n: fetch_pubmed_abstracts(gene, max_results=n),
+}
+
+# Lower is better for all of these except throughput
+COMPARED = {"p50_ms": "lower", "p95_ms": "lower", "peak_mb": "lower", "records_per_s": "higher"}
+
+
+def run_once(source, records):
+    """Fetch and build the tab's table once; returns the table."""
+    result = FETCHERS[source](GENE, records)
+    if isinstance(result, str):
+        raise RuntimeError(result)
+    return to_frame(result)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, round(q * (len(values) - 1)))]
+
+
+def bench(source, records, repeat=REPEAT):
+    http_client.install_adapter(ReplayAdapter(records), rate_limits=False)
+    run_once(source, records)  # warm-up: imports, Ensembl ID cache, replay bodies
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        table = run_once(source, records)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    run_once(source, records)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50 = statistics.median(timings)
+    return {
+        "source": source,
+        "records": records,
+        "rows": len(table),
+        "p50_ms": round(p50 * 1000, 2),
+        "p95_ms": round(percentile(timings, 0.95) * 1000, 2),
+        "max_ms": round(max(timings) * 1000, 2),
+        "peak_mb": round(peak / 2 ** 20, 2),
+        "records_per_s": round(len(table) / p50, 1) if p50 else None,
+    }
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Rows that got worse than the baseline by more than tolerance."""
+    regressions = []
+    for row in results:
+        base = baseline.get(f"{row['source']}@{row['records']}")
+        if not base:
+            continue
+        for metric, better in COMPARED.items():
+            old, new = base.get(metric), row.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (better == "lower" and change > tolerance) or (better == "higher" and -change > tolerance):
+                regressions.append(f"{row['source']}@{row['records']} {metric}: {old} → {new} ({change:+.0%})")
+    return regressions
+
+
+def record(gene):
+    """Re-record every fixture from the live APIs with a small lookup of `gene`."""
+    http_client.install_adapter(RecordingAdapter())
+    for source, fetch in FETCHERS.items():
+        result = fetch(gene, 20)
+        status = "failed: " + result if isinstance(result, str) else "ok"
+        print(f"{source}: {status}")
+    print("Fixtures written to", FIXTURE_DIR)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["record"]:
+        parser = argparse.ArgumentParser(prog="benchmarks.run record")
+        parser.add_argument("gene", nargs="?", default=GENE)
+        record(parser.parse_args(argv[1:]).gene)
+        return 0
+
+    parser = argparse.ArgumentParser(description="Offline Gene2Trials pipeline benchmarks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="result sizes to replay")
+    parser.add_argument("--sources", nargs="+", choices=list(FETCHERS), default=list(FETCHERS))
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed runs per case")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed relative slowdown")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    # Nothing may come from the response cache: every run does the full work
+    set_backend(MemoryBackend(max_entries=0))
+
+    results = [bench(source, n, args.repeat) for source in args.sources for n in args.sizes]
+    http_client.install_adapter(None)
+
+    print(pd.DataFrame(results).to_string(index=False))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({f"{r['source']}@{r['records']}": r for r in results}, f, indent=2)
+        print("Baseline saved to", args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline yet; run with --save-baseline to store one.")
+        return 0
+
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for line in regressions:
+        print("REGRESSION", line)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+# 📁 gene2trials_api.py
+"""Headless JSON API over the same fetchers as the Streamlit app.
+
+    uvicorn gene2trials_api:app --workers 4
+    python -m gene2trials_api --port 8000 --replay 100   # offline, from benchmarks/fixtures
+
+    GET /gene/{symbol}/mutations | diseases | drugs | trials | literature
+
+Handlers await the async fetchers (utils.lookup.ASYNC_SOURCES), so one worker
+serves many lookups at once without a thread each. Encoded responses are
+kept in a stale-while-revalidate cache of their own (on top of the fetcher
+cache) with a weak ETag, so repeat requests cost a dict lookup and a
+matching If-None-Match gets a bodiless 304. Bodies over a kilobyte are gzipped;
+the ETag is weak because the gzipped and identity bodies share it.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+
+from utils import async_http, http_client, metrics
+from utils.cache import TTLS, MemoryBackend, ResponseCache
+from utils.drugs import fetch_opentarget_drugs_async
+from utils.lookup import ASYNC_SOURCES
+from utils.records import to_frame
+
+# Encoded responses kept in memory; each is (status, body, etag)
+RESPONSE_CACHE_ENTRIES = 4096
+
+# How long clients may reuse a response before revalidating it with its ETag
+MAX_AGE = 300
+
+GZIP_MIN_BYTES = 1024
+
+SYMBOL = re.compile(r"^[A-Za-z0-9][A-Za-z0-9.\-]{0,29}$")
+
+# The raw drug candidates rather than the app tab's table: no "No Drug Found" row,
+# and failures or unknown symbols come back as errors
+API_SOURCES = {**ASYNC_SOURCES, "drugs": fetch_opentarget_drugs_async}
+
+_responses = ResponseCache(
+    MemoryBackend(max_entries=RESPONSE_CACHE_ENTRIES),
+    ttls={f"api:{source}": ttl for source, ttl in TTLS.items()},
+)
+
+
+def install_replay(records, latency=0.0):
+    """Answer every upstream call from benchmarks/fixtures as if it had `records` results."""
+    from benchmarks.replay import ReplayAdapter
+
+    replay = ReplayAdapter(records, latency=latency)
+    http_client.install_adapter(replay, rate_limits=False)
+    async_http.install_transport(replay.async_transport(), rate_limits=False)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # G2T_REPLAY=<records> serves the fixtures instead of the live APIs (also for `uvicorn gene2trials_api:app`)
+    if os.getenv("G2T_REPLAY"):
+        install_replay(int(os.environ["G2T_REPLAY"]))
+    yield
+    await async_http.aclose()
+
+
+app = FastAPI(title="Gene2Trials Navigator API", lifespan=lifespan)
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_BYTES)
+
+
+# ---------------------------------------------------
+# Encoding
+# ---------------------------------------------------
+
+def error_message(result):
+    """The error a fetcher reported, or None. Literature reports one as an "Error" paper."""
+    if isinstance(result, str):
+        return result
+    if isinstance(result, list) and result and result[0].get("title") == "Error":
+        return result[0]["abstract"]
+    return None
+
+
+def encode(gene, source, result):
+    """(status, JSON body, ETag) for one fetcher result."""
+    error = error_message(result)
+    if error is not None:
+        status = 404 if "No Ensembl ID found" in error else 502
+        body = json.dumps({"gene": gene, "source": source, "error": error}).encode()
+    else:
+        # to_json writes NaN as null and handles numpy scalars without a per-row pass
+        with metrics.span("encode", source=source):
+            rows = to_frame(result).to_json(orient="records", force_ascii=False)
+            count = len(result)
+            body = (
+                f'{{"gene":{json.dumps(gene)},"source":"{source}","count":{count},"rows":{rows}}}'
+            ).encode()
+        status = 200
+    return status, body, 'W/"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+async def lookup(gene, source):
+    async def fetch():
+        return encode(gene, source, await API_SOURCES[source](gene))
+
+    return await _responses.get_or_fetch_async(
+        f"api:{source}", f"{source}:{gene}", fetch, store_if=lambda value: value[0] == 200
+    )
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison, as If-None-Match uses: W/"x" and "x" match each other."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+# ---------------------------------------------------
+# Routes
+# ---------------------------------------------------
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/metrics")
+async def prometheus():
+    return Response(metrics.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/gene/{symbol}/{source}")
+async def gene_source(symbol: str, source: str, request: Request):
+    if source not in API_SOURCES:
+        raise HTTPException(404, f"Unknown source {source!r}; expected one of {', '.join(API_SOURCES)}")
+    if not SYMBOL.match(symbol):
+        raise HTTPException(422, f"Not a gene symbol: {symbol!r}")
+
+    gene = symbol.upper()
+    status, body, etag = await lookup(gene, source)
+    metrics.inc("g2t_api_requests_total", source=source, status=status)
+
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={MAX_AGE}"} if status == 200 else {}
+    if status == 200 and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, status_code=status, media_type="application/json", headers=headers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Gene2Trials pipeline as a JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument(
+        "--replay", type=int, metavar="RECORDS",
+        help="serve benchmarks/fixtures instead of the live APIs, as if each had RECORDS results"
+    )
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    if args.replay:
+        # Read again by every worker's lifespan
+        os.environ["G2T_REPLAY"] = str(args.replay)
+    uvicorn.run("gene2trials_api:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,14 @@ import streamlit as st
 import pandas as pd
 import requests
 import re
-from utils.mutations import fetch_mutations
-from utils.diseases import fetch_diseases
-from utils.drugs import fetch_drugs_for_gene
+import os
 from utils.trials import fetch_clinical_trials
-from utils.summarizer import fetch_pubmed_abstracts, summarize_text
+from utils.summarizer import iter_summaries, stream_literature_review
+from utils.trials import render_trials_ui
+from utils.lookup import start_gene_lookup, iter_completed
+from utils.report import build_gene_report
+from utils.records import to_frame
+from utils import metrics
 from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
 from st_aggrid.shared import JsCode
 
@@ -20,129 +23,267 @@ drugs, clinical trials, and AI-generated research summaries.
 
 gene_symbol = st.text_input("🔍 Enter Gene Symbol:", "TP53")
 
-if gene_symbol:
-    tab1, tab2, tab3, tab4, tab5 = st.tabs([
-        "Gene Mutations", "Associated Diseases", "Drugs", "Clinical Trials", "Research Summaries"])
 
-    # 🦠 GENE MUTATIONS TAB
-    with tab1:
-        st.subheader("🦠 Gene Mutations")
+# 🦠 GENE MUTATIONS TAB
+def render_mutations(gene_symbol, future):
+    st.subheader("🦠 Gene Mutations")
 
-        try:
-            mutations = fetch_mutations(gene_symbol)
+    try:
+        mutations = future.result()
 
-            if isinstance(mutations, list) and mutations and isinstance(mutations[0], dict):
-                df_mut = pd.DataFrame(mutations)
-                df_mut.sort_values(by="cadd_score", ascending=False, inplace=True)
+        if isinstance(mutations, pd.DataFrame) and not mutations.empty:
+            # cadd_score is a float column; unknown scores (NaN) sort last
+            df_mut = mutations.sort_values(by="cadd_score", ascending=False, na_position="last")
 
-                st.markdown(df_mut.to_html(escape=False, index=False), unsafe_allow_html=True)
+            st.markdown(df_mut.to_html(escape=False, index=False, na_rep="N/A"), unsafe_allow_html=True)
 
 
-                st.download_button(
-                    label="📅 Download Mutations CSV",
-                    data=df_mut.to_csv(index=False).encode('utf-8'),
-                    file_name=f"{gene_symbol}_mutations.csv",
-                    mime="text/csv"
-                )
-            else:
-                st.write(mutations)
+            st.download_button(
+                label="📅 Download Mutations CSV",
+                data=df_mut.to_csv(index=False, na_rep="N/A").encode('utf-8'),
+                file_name=f"{gene_symbol}_mutations.csv",
+                mime="text/csv"
+            )
+        elif isinstance(mutations, pd.DataFrame):
+            st.warning("No mutations found.")
+        else:
+            st.write(mutations)
 
-        except Exception as e:
-            st.error(f"Error fetching mutations: {e}")
+    except Exception as e:
+        st.error(f"Error fetching mutations: {e}")
 
-    # �� ASSOCIATED DISEASES TAB
-    with tab2:
-        st.subheader("�� Associated Diseases")
-        try:
-            diseases = fetch_diseases(gene_symbol)
-            if isinstance(diseases, list) and isinstance(diseases[0], dict):
-                df_disease = pd.DataFrame(diseases)
-                 # Format numeric scores to 2 decimal places
-                
-                st.markdown(df_disease.to_markdown(index=False), unsafe_allow_html=True)
-
-                st.download_button(
-                    label="📅 Download Diseases CSV",
-                    data=df_disease.to_csv(index=False).encode('utf-8'),
-                    file_name=f"{gene_symbol}_diseases.csv",
-                    mime="text/csv"
-                )
-            else:
-                st.warning(diseases if isinstance(diseases, str) else "No diseases found.")
-        except Exception as e:
-            st.error(f"Error fetching diseases: {e}")
 
-    # 💊 DRUGS TAB
-    with tab3:
-        st.subheader("💊 Drugs for Mutations")
-        try:
-            df_drugs = fetch_drugs_for_gene(gene_symbol)
-             # Agar fallback dict ya dataframe se aa raha ho
-            if isinstance(df_drugs, list):  # fallback list of dicts
-                import pandas as pd
-                df_drugs = pd.DataFrame(df_drugs)
-            # Show unique sources if available
-            if not df_drugs.empty:
-                st.markdown(f"**Data for gene:** {gene_symbol}")
-                df_display = df_drugs.dropna(axis=1, how="all")
-                if "Approval" in df_display.columns:
-                    approval_map = {
-                        "0": "Preclinical",
-                        "1": "Phase 1",
-                        "2": "Phase 2",
-                        "3": "Phase 3",
-                        "4": "Approved"
-                   }
-                    df_display["Approval"] = (
-                        df_display["Approval"].astype(str).map(approval_map).fillna(df_display["Approval"]))
-
-                 # ✅ Ensure clean clickable IDs for BOTH fallback + API
-                if "ID" in df_display.columns:
-                    def make_clickable(x):
-                        if pd.isna(x):
-                            return "N/A"
-                    # Remove any existing markdown around IDs like [CHEMBL1234](url)
-                        plain_id = re.sub(r"^\[?([A-Z0-9]+)\]?.*$", r"\1", str(x))
-                        return f"[{plain_id}](https://www.ebi.ac.uk/chembl/compound_report_card/{plain_id}/)"
-
-                    df_display["ID"] = df_display["ID"].apply(make_clickable)
-    # Show styled dataframe with clickable links
-                st.markdown(df_display.to_markdown(index=False), unsafe_allow_html=True)
-
-                # 🔹 Show sources used
-                if "Source" in df_drugs.columns:
-                    st.markdown("**Sources used:** " + ", ".join(df_drugs["Source"].dropna().unique()))
-
-                #st.markdown("**Sources used:** " + ", ".join(df_drugs["Source"].unique()))
-                st.download_button(
-                    label="📅 Download Drugs CSV",
-                    data=df_drugs.to_csv(index=False).encode('utf-8'),
-                    file_name=f"{gene_symbol}_drugs.csv",
-                    mime="text/csv"
-                )
-
-            else:
-                st.warning("No drug data found.")
-        except Exception as e:
-            st.error(f"Error fetching drugs: {e}")
+# �� ASSOCIATED DISEASES TAB
+def render_diseases(gene_symbol, future):
+    st.subheader("�� Associated Diseases")
+    try:
+        diseases = future.result()
+        if isinstance(diseases, list) and diseases:
+            df_disease = to_frame(diseases)
+             # Format numeric scores to 2 decimal places
 
-    # 🤪 CLINICAL TRIALS TAB
-    with tab4:
-        st.subheader("🔍 Clinical Trials")
-        from utils.trials import render_trials_ui
-        render_trials_ui(gene_symbol)
+            st.markdown(df_disease.to_markdown(index=False), unsafe_allow_html=True)
 
+            st.download_button(
+                label="📅 Download Diseases CSV",
+                data=df_disease.to_csv(index=False).encode('utf-8'),
+                file_name=f"{gene_symbol}_diseases.csv",
+                mime="text/csv"
+            )
+        else:
+            st.warning(diseases if isinstance(diseases, str) else "No diseases found.")
+    except Exception as e:
+        st.error(f"Error fetching diseases: {e}")
 
-    # 📚 RESEARCH SUMMARIES TAB
-    with tab5:
-        st.subheader("📚 Research Summaries")
-        try:
-            abstracts = fetch_pubmed_abstracts(gene_symbol)
-            summaries = [summarize_text(a["title"] + ". " + a["abstract"]) for a in abstracts]
 
-            for i, summary in enumerate(summaries):
-                st.markdown(f"**{i+1}. {abstracts[i]['title']}**")
-                st.markdown(summary)
+# 💊 DRUGS TAB
+def render_drugs(gene_symbol, future):
+    st.subheader("💊 Drugs for Mutations")
+    try:
+        df_drugs = future.result()
+         # Agar fallback dict ya dataframe se aa raha ho
+        if isinstance(df_drugs, list):  # fallback list of dicts
+            df_drugs = pd.DataFrame(df_drugs)
+        # Show unique sources if available
+        if not df_drugs.empty:
+            st.markdown(f"**Data for gene:** {gene_symbol}")
+            df_display = df_drugs.dropna(axis=1, how="all")
+            if "Approval" in df_display.columns:
+                approval_map = {
+                    "0": "Preclinical",
+                    "1": "Phase 1",
+                    "2": "Phase 2",
+                    "3": "Phase 3",
+                    "4": "Approved"
+               }
+                df_display["Approval"] = (
+                    df_display["Approval"].astype(str).map(approval_map).fillna(df_display["Approval"]))
+
+             # ✅ Ensure clean clickable IDs for BOTH fallback + API
+            if "ID" in df_display.columns:
+                def make_clickable(x):
+                    if pd.isna(x):
+                        return "N/A"
+                # Remove any existing markdown around IDs like [CHEMBL1234](url)
+                    plain_id = re.sub(r"^\[?([A-Z0-9]+)\]?.*$", r"\1", str(x))
+                    return f"[{plain_id}](https://www.ebi.ac.uk/chembl/compound_report_card/{plain_id}/)"
+
+                df_display["ID"] = df_display["ID"].apply(make_clickable)
+# Show styled dataframe with clickable links
+            st.markdown(df_display.to_markdown(index=False), unsafe_allow_html=True)
+
+            # 🔹 Show sources used
+            if "Source" in df_drugs.columns:
+                st.markdown("**Sources used:** " + ", ".join(df_drugs["Source"].dropna().unique()))
+
+            #st.markdown("**Sources used:** " + ", ".join(df_drugs["Source"].unique()))
+            st.download_button(
+                label="📅 Download Drugs CSV",
+                data=df_drugs.to_csv(index=False).encode('utf-8'),
+                file_name=f"{gene_symbol}_drugs.csv",
+                mime="text/csv"
+            )
 
+        else:
+            st.warning("No drug data found.")
+    except Exception as e:
+        st.error(f"Error fetching drugs: {e}")
+
+
+# 🤪 CLINICAL TRIALS TAB
+def render_trials(gene_symbol, future):
+    st.subheader("🔍 Clinical Trials")
+    try:
+        trials, more_pages = future.result()
+        # Rest of the pages load after the other tabs have rendered
+        return render_trials_ui(gene_symbol, trials=trials, more_pages=more_pages, defer=True)
+    except Exception as e:
+        st.error(f"Error fetching trials: {e}")
+
+
+# 📚 RESEARCH SUMMARIES TAB
+def render_summaries(gene_symbol, future):
+    st.subheader("📚 Research Summaries")
+    try:
+        abstracts = future.result()
+
+        # Literature review streams in token by token once requested, after the other tabs render
+        review_requested = abstracts and st.button("🧠 Generate literature review", key=f"review_{gene_symbol}")
+        review = st.container()
+
+        # Titles go out right away; each summary fills in as its batch finishes
+        placeholders = []
+        for i, a in enumerate(abstracts):
+            st.markdown(f"**{i+1}. {a['title']}**")
+            placeholders.append(st.empty())
+            placeholders[-1].caption("⏳ Summarizing...")
+
+    except Exception as e:
+        st.error(f"Error generating summaries: {e}")
+        return
+
+    def fill_summaries():
+        if review_requested:
+            try:
+                review.write_stream(stream_literature_review(gene_symbol, papers=abstracts))
+            except Exception as e:
+                review.error(f"Error generating literature review: {e}")
+
+        try:
+            texts = [a["title"] + ". " + a["abstract"] for a in abstracts]
+            for i, summary in iter_summaries(texts):
+                placeholders[i].markdown(summary)
         except Exception as e:
             st.error(f"Error generating summaries: {e}")
+
+    # Review and summaries run after the other tabs have rendered
+    return fill_summaries
+
+
+# 🔗 GENE REPORT TAB
+def render_report(gene_symbol, lookup):
+    st.subheader("🔗 Disease → Trial and Drug → Trial Links")
+    try:
+        # Full trial list: the streamed tab has cached it by now
+        report = build_gene_report(
+            lookup["diseases"].result(),
+            lookup["drugs"].result(),
+            fetch_clinical_trials(gene_symbol)
+        )
+
+        st.markdown("**Diseases associated with the gene that have matching trials**")
+        st.dataframe(report["disease_trials"], use_container_width=True, hide_index=True)
+
+        st.markdown("**Trials testing the gene's drug candidates or their diseases**")
+        st.dataframe(report["drug_trials"], use_container_width=True, hide_index=True)
+
+        st.download_button(
+            label="📅 Download Drug → Trial Links CSV",
+            data=report["drug_trials"].to_csv(index=False).encode('utf-8'),
+            file_name=f"{gene_symbol}_drug_trial_links.csv",
+            mime="text/csv"
+        )
+    except Exception as e:
+        st.error(f"Error building gene report: {e}")
+
+
+# 🩺 DIAGNOSTICS (hidden: open the app with ?diagnostics=1 or set G2T_DIAGNOSTICS=1)
+def diagnostics_enabled():
+    return st.query_params.get("diagnostics") == "1" or os.getenv("G2T_DIAGNOSTICS") == "1"
+
+
+def render_diagnostics(trace):
+    with st.sidebar.expander("🩺 Diagnostics", expanded=True):
+        spans = pd.DataFrame(trace.rows())
+        if spans.empty:
+            st.caption("No spans recorded for this lookup.")
+        else:
+            import altair as alt
+
+            # Waterfall: one row per source, one bar per span, coloured by phase
+            chart = alt.Chart(spans).mark_bar().encode(
+                x=alt.X("start_ms:Q", title="ms since lookup start"),
+                x2="end_ms:Q",
+                y=alt.Y("source:N", title=None),
+                color="phase:N",
+                tooltip=[c for c in ("source", "phase", "host", "status", "bytes", "duration_ms") if c in spans]
+            )
+            st.altair_chart(chart, use_container_width=True)
+
+            per_source = spans.groupby(["source", "phase"])["duration_ms"].agg(["count", "sum"]).round(1)
+            st.dataframe(per_source, use_container_width=True)
+
+        ratios = metrics.cache_hit_ratios()
+        if ratios:
+            st.markdown("**Cache hit ratio**")
+            st.dataframe(pd.Series(ratios, name="hit ratio").round(2), use_container_width=True)
+
+        st.download_button("Prometheus metrics", metrics.prometheus_text(), file_name="gene2trials.prom")
+        st.download_button("Metrics (JSON lines)", metrics.json_lines(), file_name="gene2trials_metrics.jsonl")
+
+
+TAB_RENDERERS = {
+    "mutations": render_mutations,
+    "diseases": render_diseases,
+    "drugs": render_drugs,
+    "trials": render_trials,
+    "literature": render_summaries,
+}
+
+
+if gene_symbol:
+    # Kick off every source at once; wall time is the slowest upstream, not the sum.
+    trace = metrics.Trace(gene_symbol)
+    lookup = start_gene_lookup(gene_symbol, trace=trace)
+
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
+        "Gene Mutations", "Associated Diseases", "Drugs", "Clinical Trials", "Research Summaries",
+        "Gene Report"])
+    tabs = dict(zip(TAB_RENDERERS, (tab1, tab2, tab3, tab4, tab5)))
+
+    placeholders = {}
+    for name, tab in tabs.items():
+        with tab:
+            placeholders[name] = st.empty()
+            placeholders[name].info("⏳ Loading...")
+
+    # Fill each tab as soon as its own source finishes
+    deferred = []
+    for name, future in iter_completed(lookup):
+        placeholders[name].empty()
+        with tabs[name], metrics.tracing(trace, name):
+            finish = TAB_RENDERERS[name](gene_symbol, future)
+        if finish:
+            deferred.append((name, finish))
+
+    # Then keep streaming into tabs that load progressively
+    for name, finish in deferred:
+        with tabs[name], metrics.tracing(trace, name):
+            finish()
+
+    # Cross-source links need every table, so they come last
+    with tab6, metrics.tracing(trace, "report"), metrics.span("total"):
+        render_report(gene_symbol, lookup)
+
+    if diagnostics_enabled():
+        render_diagnostics(trace)
@@ -0,0 +1,8 @@
+# 📁 tests/conftest.py
+import os
+import tempfile
+
+# Isolated caches and the live upstreams, whatever the environment says (as benchmarks/run.py does)
+os.environ["G2T_CACHE_DIR"] = tempfile.mkdtemp(prefix="g2t-tests-")
+for name in ("G2T_OT_STORE", "G2T_TRIAL_INDEX", "G2T_CACHE_BACKEND", "G2T_METRICS_LOG", "G2T_REPLAY"):
+    os.environ.pop(name, None)
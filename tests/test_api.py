@@ -0,0 +1,68 @@
+# 📁 tests/test_api.py
+"""gene2trials_api served from benchmarks.replay (G2T_REPLAY)."""
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("streamlit")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import gene2trials_api as api  # noqa: E402
+from utils import async_http, http_client  # noqa: E402
+
+RECORDS = 30
+
+
+@pytest.fixture(scope="module")
+def client():
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("G2T_REPLAY", str(RECORDS))
+        with TestClient(api.app) as client:
+            yield client
+    http_client.install_adapter(None)
+    async_http.install_transport(None)
+
+
+@pytest.mark.parametrize("source", list(api.API_SOURCES))
+def test_every_source(client, source):
+    res = client.get(f"/gene/tp53/{source}")
+    assert res.status_code == 200
+    body = res.json()
+    assert (body["gene"], body["source"]) == ("TP53", source)
+    assert body["count"] == len(body["rows"]) > 0
+
+
+def test_bad_requests(client):
+    assert client.get("/gene/TP53/nope").status_code == 404
+    assert client.get("/gene/%3Cx%3E/diseases").status_code == 422
+
+
+def test_etag_and_304(client):
+    res = client.get("/gene/TP53/trials")
+    etag = res.headers["etag"]
+    # One tag for the gzipped and the identity body, so it must be weak
+    assert etag.startswith('W/"')
+
+    for tag in (etag, etag.removeprefix("W/"), f'"other", {etag}'):
+        again = client.get("/gene/TP53/trials", headers={"If-None-Match": tag})
+        assert again.status_code == 304
+        assert again.content == b""
+        assert again.headers["etag"] == etag
+    assert client.get("/gene/TP53/trials", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_gzip(client):
+    res = client.get("/gene/TP53/diseases", headers={"Accept-Encoding": "gzip"})
+    assert res.headers["content-encoding"] == "gzip"
+    assert res.json()["count"] == RECORDS
+
+    plain = client.get("/gene/TP53/diseases", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["etag"] == res.headers["etag"]
+
+
+def test_fetcher_errors():
+    # Replay knows every symbol, so unknown genes and upstream failures are checked on encode()
+    assert api.encode("NOPE", "drugs", "No Ensembl ID found for gene symbol: NOPE")[0] == 404
+    status, body, _ = api.encode("TP53", "drugs", "Error fetching drugs: Open Targets request failed")
+    assert status == 502 and b"Open Targets request failed" in body
@@ -0,0 +1,149 @@
+# 📁 tests/test_ot_store.py
+"""utils.ot_store against a tiny Parquet release written with pyarrow."""
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from utils import ot_store
+
+TP53 = "ENSG00000141510"
+BRCA1 = "ENSG00000012048"
+
+
+def write(path, columns):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(pa.table(columns), path)
+
+
+@pytest.fixture
+def release(tmp_path):
+    root = tmp_path / "release"
+    write(str(root / "targets" / "part-0.parquet"), {
+        "id": [TP53, BRCA1],
+        "approvedSymbol": ["TP53", "BRCA1"],
+        "biotype": ["protein_coding", "protein_coding"],
+    })
+    write(str(root / "diseases" / "part-0.parquet"), {
+        "id": ["EFO_0000305", "MONDO_0007254"],
+        "name": ["breast carcinoma", "breast cancer"],
+    })
+    # Split over two files, as the real dataset folders are
+    write(str(root / "association_overall_direct" / "part-0.parquet"), {
+        "targetId": [TP53, BRCA1],
+        "diseaseId": ["EFO_0000305", "MONDO_0007254"],
+        "score": [0.4, 0.9],
+    })
+    write(str(root / "association_overall_direct" / "part-1.parquet"), {
+        "targetId": [TP53, TP53],
+        "diseaseId": ["MONDO_0007254", "EFO_9999999"],
+        "score": [0.8, 0.1],
+    })
+    # Older release column names: drugName / maximumClinicalStage / diseaseName
+    write(str(root / "knownDrugsAggregated" / "part-0.parquet"), {
+        "targetId": [TP53, TP53, TP53, TP53, BRCA1],
+        "drugId": ["CHEMBL1", "CHEMBL1", "CHEMBL1", "CHEMBL2", "CHEMBL3"],
+        "drugName": ["DRUG ONE", "DRUG ONE", "DRUG ONE", "DRUG TWO", "DRUG THREE"],
+        "maximumClinicalStage": [2.0, 4.0, 4.0, 0.5, None],
+        "diseaseId": ["EFO_0000305", "MONDO_0007254", "MONDO_0007254", "EFO_0000305", "MONDO_0007254"],
+        "diseaseName": ["breast carcinoma", "breast cancer", "breast cancer", "breast carcinoma", "breast cancer"],
+    })
+    return str(root)
+
+
+@pytest.fixture
+def store(release, tmp_path):
+    db = str(tmp_path / "ot.sqlite")
+    paths = {name: ot_store.find_dataset(release, name) for name in ot_store.DATASETS}
+    ot_store.ingest(db, log=lambda message: None, **paths)
+    return ot_store.OpenTargetsStore(db)
+
+
+def test_find_dataset_uses_first_known_folder(release):
+    assert ot_store.find_dataset(release, "associations").endswith("association_overall_direct")
+    assert ot_store.find_dataset(release, "drugs").endswith("knownDrugsAggregated")
+
+
+def test_missing_column_is_reported(tmp_path):
+    path = str(tmp_path / "targets.parquet")
+    write(path, {"id": [TP53]})
+    with pytest.raises(ValueError, match="approvedSymbol"):
+        list(ot_store.iter_parquet_batches(path, ot_store.COLUMNS["targets"]))
+
+
+def test_ensembl_id_ignores_case(store):
+    assert store.ensembl_id("tp53") == TP53
+    assert store.ensembl_id(" BRCA1 ") == BRCA1
+    assert store.ensembl_id("NOPE") is None
+
+
+def test_disease_rows_best_score_first(store):
+    rows = store.disease_rows(TP53)
+    assert [row["disease"]["id"] for row in rows] == ["MONDO_0007254", "EFO_0000305", "EFO_9999999"]
+    assert rows[0] == {"disease": {"id": "MONDO_0007254", "name": "breast cancer"}, "score": 0.8}
+    # Diseases missing from the diseases dataset fall back to their ID
+    assert rows[-1]["disease"]["name"] == "EFO_9999999"
+
+
+def test_disease_rows_filters(store):
+    assert len(store.disease_rows(TP53, min_score=0.3)) == 2
+    assert [row["score"] for row in store.disease_rows(TP53, top_k=1)] == [0.8]
+
+
+def test_drug_rows_grouped_per_drug(store):
+    rows = {row["id"]: row for row in store.drug_rows(TP53)}
+    assert set(rows) == {"CHEMBL1", "CHEMBL2"}
+
+    one = rows["CHEMBL1"]
+    # Stage names as the GraphQL API gives them; the furthest one wins; duplicate diseases collapse
+    assert one["maxClinicalStage"] == one["drug"]["maximumClinicalStage"] == "APPROVAL"
+    assert one["drug"]["name"] == "DRUG ONE"
+    assert [d["disease"]["id"] for d in one["diseases"]] == ["EFO_0000305", "MONDO_0007254"]
+
+    assert rows["CHEMBL2"]["maxClinicalStage"] == "EARLY_PHASE_1"
+    # A missing phase is stored as NULL, not the string "nan"
+    assert [row["maxClinicalStage"] for row in store.drug_rows(BRCA1)] == [None]
+
+
+def test_ingest_replaces_previous_rows(release, tmp_path):
+    db = str(tmp_path / "ot.sqlite")
+    targets = ot_store.find_dataset(release, "targets")
+    ot_store.ingest(db, targets=targets, log=lambda message: None)
+    ot_store.ingest(db, targets=targets, log=lambda message: None)
+    assert ot_store.OpenTargetsStore(db)._db().execute("SELECT COUNT(*) FROM targets").fetchone() == (2,)
+
+
+def test_phase_to_stage():
+    assert ot_store.phase_to_stage(3.0) == "PHASE_3"
+    assert ot_store.phase_to_stage(4) == "APPROVAL"
+    assert ot_store.phase_to_stage("PHASE_2_3") == "PHASE_2_3"
+    assert ot_store.phase_to_stage(float("nan")) is None
+    assert ot_store.phase_to_stage(None) is None
+
+
+def test_stage_rank():
+    assert ot_store._stage_rank("APPROVAL") > ot_store._stage_rank("PHASE_3") > ot_store._stage_rank(None)
+
+
+def test_get_ot_store_follows_env(store, monkeypatch, tmp_path):
+    monkeypatch.setenv("G2T_OT_STORE", store.path)
+    assert ot_store.get_ot_store().path == store.path
+    monkeypatch.setenv("G2T_OT_STORE", str(tmp_path / "missing.sqlite"))
+    assert ot_store.get_ot_store() is None
+
+
+def test_panel_reads_store(store, monkeypatch):
+    pytest.importorskip("streamlit")
+    from utils import panel
+
+    def no_graphql(*args, **kwargs):
+        raise AssertionError("panel went to the GraphQL API")
+
+    monkeypatch.setenv("G2T_OT_STORE", store.path)
+    monkeypatch.setattr(panel, "fetch_targets_for_symbols", no_graphql)
+
+    results = panel.run_panel(["TP53", "BRCA1"], sources=["diseases", "drugs"])
+    assert results["errors"].empty
+    assert results["diseases"].groupby("gene").size().to_dict() == {"BRCA1": 1, "TP53": 3}
+    assert set(results["drugs"]["gene"]) == {"TP53", "BRCA1"}
@@ -0,0 +1,42 @@
+# 📁 tests/test_replay.py
+"""utils.panel end to end against benchmarks.replay."""
+import pytest
+
+from benchmarks.replay import ReplayAdapter
+from utils import async_http, http_client
+from utils.cache import MemoryBackend, set_backend
+
+# More than one DISEASE_PAGE_SIZE page, so the panel also fetches the later pages
+RECORDS = 250
+
+
+@pytest.fixture
+def replay():
+    set_backend(MemoryBackend(max_entries=0))
+    adapter = ReplayAdapter(RECORDS)
+    http_client.install_adapter(adapter, rate_limits=False)
+    async_http.install_transport(adapter.async_transport(), rate_limits=False)
+    yield adapter
+    http_client.install_adapter(None)
+    async_http.install_transport(None)
+    set_backend(MemoryBackend())
+
+
+def test_batched_document_answers_every_alias(replay):
+    from utils.opentargets import fetch_targets_for_symbols
+
+    targets = fetch_targets_for_symbols(["TP53", "GENE1"])
+    assert targets["TP53"]["ensembl_id"] == "ENSG00000141510"
+    assert targets["GENE1"]["ensembl_id"] != targets["TP53"]["ensembl_id"]
+    assert targets["GENE1"]["disease_count"] == RECORDS
+    assert len(targets["GENE1"]["drugs"]) == RECORDS
+
+
+def test_panel_under_replay(replay):
+    pytest.importorskip("streamlit")
+    from utils import panel
+
+    results = panel.run_panel(["TP53", "GENE1"], sources=["diseases", "drugs"])
+    assert results["errors"].empty
+    assert results["diseases"].groupby("gene").size().to_dict() == {"GENE1": RECORDS, "TP53": RECORDS}
+    assert results["drugs"].groupby("gene").size().to_dict() == {"GENE1": RECORDS, "TP53": RECORDS}
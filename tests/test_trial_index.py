@@ -0,0 +1,111 @@
+# 📁 tests/test_trial_index.py
+"""utils.trial_index against a small JSON-lines export."""
+import json
+import os
+
+import pytest
+
+from utils import trial_index
+from utils.records import Trial
+
+
+def study(nct_id, title, conditions, sponsor, status, interventions=(), keywords=()):
+    return {"protocolSection": {
+        "identificationModule": {"nctId": nct_id, "briefTitle": title},
+        "conditionsModule": {"conditions": list(conditions), "keywords": list(keywords)},
+        "sponsorCollaboratorsModule": {"leadSponsor": {"name": sponsor}},
+        "statusModule": {"overallStatus": status},
+        "armsInterventionsModule": {"interventions": [{"name": name} for name in interventions]},
+    }}
+
+
+STUDIES = [
+    study("NCT00000001", "TP53 reactivation in AML", ["Acute Myeloid Leukemia"],
+          "Aprea Therapeutics", "COMPLETED", ["APR-246"]),
+    study("NCT00000002", "Eprenetapopt with azacitidine", ["Myelodysplastic Syndromes"],
+          "Aprea Therapeutics", "RECRUITING", ["APR-246", "Azacitidine"], keywords=["TP53"]),
+    study("NCT00000003", "BRCA1 carriers and PARP inhibition", ["Breast Cancer"],
+          "National Cancer Institute (NCI)", "RECRUITING", ["Olaparib"]),
+]
+
+
+def write_lines(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def index(tmp_path):
+    db = str(tmp_path / "trials.sqlite")
+    assert trial_index.build(db, write_lines(tmp_path / "export.jsonl", STUDIES), log=lambda m: None) == (3, 0)
+    return trial_index.TrialIndex(db)
+
+
+def ids(trials):
+    return [trial.nct_id for trial in trials]
+
+
+def test_iter_export_reads_arrays_and_lines(tmp_path):
+    array = tmp_path / "export.json"
+    array.write_text(json.dumps(STUDIES))
+    assert list(trial_index.iter_export(str(array))) == STUDIES
+    assert list(trial_index.iter_export(write_lines(tmp_path / "export.jsonl", STUDIES))) == STUDIES
+
+
+def test_search_matches_every_word_in_any_indexed_field(index):
+    # "TP53" is in one title and in the other study's keywords
+    assert ids(index.search("tp53")) == ["NCT00000002", "NCT00000001"]
+    assert ids(index.search("TP53 leukemia")) == ["NCT00000001"]
+    assert ids(index.search("apr 246")) == ["NCT00000002", "NCT00000001"]
+    assert index.search("TP53 olaparib") == []
+    assert index.search("   ") == []
+
+
+def test_search_returns_trial_records(index):
+    trial = index.search("olaparib")[0]
+    assert trial == Trial(
+        nct_id="NCT00000003", title="BRCA1 carriers and PARP inhibition", condition="Breast Cancer",
+        sponsor="National Cancer Institute (NCI)", overall_status="RECRUITING", interventions="Olaparib",
+    )
+
+
+def test_search_filters(index):
+    assert ids(index.search("APR", statuses=["recruiting"])) == ["NCT00000002"]
+    assert ids(index.search("APR", statuses=["COMPLETED", "RECRUITING"])) == ["NCT00000002", "NCT00000001"]
+    assert ids(index.search("breast", sponsor="cancer institute")) == ["NCT00000003"]
+    assert index.search("breast", sponsor="Aprea") == []
+    assert len(index.search("APR", limit=1)) == 1
+
+
+def test_update_replaces_and_deletes(index, tmp_path):
+    delta = write_lines(tmp_path / "delta.jsonl", [
+        study("NCT00000001", "TP53 reactivation in AML", ["Acute Myeloid Leukemia"],
+              "Aprea Therapeutics", "TERMINATED", ["APR-246"]),
+        {"nctId": "NCT00000003", "deleted": True},
+    ])
+    assert trial_index.update(index.path, delta, log=lambda m: None) == (1, 1)
+
+    index = trial_index.TrialIndex(index.path)
+    assert [t.overall_status for t in index.search("leukemia")] == ["TERMINATED"]
+    # A deleted study leaves no postings behind
+    assert index.search("olaparib") == []
+    assert index._db().execute("SELECT COUNT(*) FROM postings WHERE nct_id = 'NCT00000003'").fetchone() == (0,)
+
+
+def test_failed_build_keeps_previous_index(index, tmp_path):
+    broken = tmp_path / "broken.jsonl"
+    broken.write_text(json.dumps(STUDIES[0]) + "\n{not json\n")
+    with pytest.raises(ValueError):
+        trial_index.build(index.path, str(broken), log=lambda m: None)
+
+    assert ids(trial_index.TrialIndex(index.path).search("olaparib")) == ["NCT00000003"]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".building")]
+
+
+def test_get_trial_index_follows_env(index, monkeypatch, tmp_path):
+    monkeypatch.setenv("G2T_TRIAL_INDEX", index.path)
+    assert trial_index.get_trial_index().path == index.path
+    monkeypatch.setenv("G2T_TRIAL_INDEX", str(tmp_path / "missing.sqlite"))
+    assert trial_index.get_trial_index() is None
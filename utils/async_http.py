@@ -0,0 +1,138 @@
+# 📁 utils/async_http.py
+"""asyncio counterpart of utils.http_client, on pooled httpx.AsyncClients.
+
+Same per-host settings (timeouts, max in-flight requests), the same token
+buckets — one rate budget per upstream whether calls come from threads or
+coroutines — and the same retry, backoff and single-flight rules. Waiting
+requests are coroutines, not threads, so a batch job can keep thousands of
+them queued.
+"""
+import asyncio
+import weakref
+from urllib.parse import urlsplit
+
+import httpx
+
+from utils import http_client, metrics
+from utils.http_client import COALESCED_METHODS, HEADERS, MAX_RETRIES, RETRY_STATUSES, backoff_delay
+
+# Set by install_transport(); replaces the network for every new client
+_transport = None
+
+_loops = weakref.WeakKeyDictionary()
+
+
+class _LoopState:
+    """Clients, semaphores and in-flight calls belong to one event loop."""
+
+    def __init__(self):
+        self.clients = {}
+        self.semaphores = {}
+        self.in_flight = {}
+
+    def client(self, host):
+        if host not in self.clients:
+            config = http_client.host_config(host)
+            connect, read = config["timeout"]
+            self.clients[host] = httpx.AsyncClient(
+                headers=HEADERS,
+                timeout=httpx.Timeout(read, connect=connect),
+                limits=httpx.Limits(max_connections=config["max_concurrency"]),
+                transport=_transport,
+            )
+            self.semaphores[host] = asyncio.Semaphore(config["max_concurrency"])
+        return self.clients[host]
+
+
+def _state():
+    loop = asyncio.get_running_loop()
+    if loop not in _loops:
+        _loops[loop] = _LoopState()
+    return _loops[loop]
+
+
+def install_transport(transport, rate_limits=True):
+    """Send every request through `transport` (an httpx transport), or back to the
+    network with None. Affects clients created afterwards, i.e. in new event loops.
+    """
+    global _transport
+    _transport = transport
+    http_client.set_rate_limits(rate_limits)
+
+
+async def aclose():
+    """Close the current event loop's connection pools."""
+    state = _loops.pop(asyncio.get_running_loop(), None)
+    if state:
+        await asyncio.gather(*(client.aclose() for client in state.clients.values()))
+
+
+async def request(method, url, max_retries=MAX_RETRIES, **kwargs):
+    """Send a request through the pooled client for the URL's host.
+
+    Identical GET/POST requests already in flight on this loop are awaited
+    instead of sent again; the shared httpx.Response must be treated as read-only.
+    """
+    if method.upper() not in COALESCED_METHODS:
+        return await _send(method, url, max_retries, **kwargs)
+
+    state = _state()
+    key = http_client.request_key(method, url, **kwargs)
+    task = state.in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_send(method, url, max_retries, **kwargs))
+        state.in_flight[key] = task
+        task.add_done_callback(lambda _: state.in_flight.pop(key, None))
+    else:
+        metrics.inc("g2t_http_coalesced_total", host=urlsplit(url).hostname)
+    # One caller giving up must not cancel the call for the others
+    return await asyncio.shield(task)
+
+
+async def _send(method, url, max_retries=MAX_RETRIES, **kwargs):
+    """Retries connection errors, timeouts and 429/5xx responses with backoff, like http_client."""
+    host = urlsplit(url).hostname
+    state = _state()
+    client = state.client(host)
+    limiter = http_client.get_limiter(host)
+
+    for attempt in range(max_retries + 1):
+        if limiter:
+            with metrics.span("rate_limit", host=host):
+                wait = limiter.reserve()
+                while wait:
+                    await asyncio.sleep(wait)
+                    wait = limiter.reserve()
+        try:
+            async with state.semaphores[host]:
+                with metrics.span("network", host=host, attempt=attempt) as attrs:
+                    response = await client.request(method, url, **kwargs)
+                    attrs["status"] = response.status_code
+                    attrs["bytes"] = len(response.content)
+        except httpx.TransportError as e:
+            metrics.inc("g2t_http_requests_total", host=host, status=type(e).__name__)
+            if attempt == max_retries:
+                raise
+            metrics.inc("g2t_http_retries_total", host=host)
+            with metrics.span("backoff", host=host):
+                await asyncio.sleep(backoff_delay(attempt))
+            continue
+
+        metrics.inc("g2t_http_requests_total", host=host, status=response.status_code)
+        metrics.inc("g2t_http_bytes_total", attrs["bytes"], host=host)
+
+        if response.status_code in RETRY_STATUSES and attempt < max_retries:
+            metrics.inc("g2t_http_retries_total", host=host)
+            with metrics.span("backoff", host=host):
+                await asyncio.sleep(backoff_delay(attempt, http_client._retry_after(response)))
+            continue
+
+        return response
+
+
+async def get(url, **kwargs):
+    return await request("GET", url, **kwargs)
+
+
+async def post(url, **kwargs):
+    return await request("POST", url, **kwargs)
@@ -0,0 +1,380 @@
+# 📁 utils/cache.py
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import metrics
+from utils.settings import cache_path
+
+# Seconds a fetched payload counts as fresh. After that it is still served for
+# another STALE_FACTOR × ttl while a background refresh replaces it.
+TTLS = {
+    "mutations": 7 * 24 * 3600,
+    "diseases": 24 * 3600,
+    "drugs": 24 * 3600,
+    "trials": 6 * 3600,
+    "literature": 6 * 3600,
+}
+DEFAULT_TTL = 3600
+STALE_FACTOR = 1.0
+
+
+# ---------------------------------------------------
+# Backends
+# ---------------------------------------------------
+
+class MemoryBackend:
+    """LRU dict of already-parsed payloads; hits cost a dict lookup."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, value, stored_at=None):
+        with self._lock:
+            self._data[key] = (stored_at or time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SqliteBackend:
+    """Pickled payloads in a SQLite file, evicting least recently used rows past max_bytes."""
+
+    def __init__(self, path=None, max_bytes=256 * 1024 * 1024):
+        self.path = path or cache_path("responses.sqlite")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, stored_at REAL NOT NULL, used_at REAL NOT NULL, "
+            "size INTEGER NOT NULL, value BLOB NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+        self._db.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT stored_at, value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE responses SET used_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        return row[0], pickle.loads(row[1])
+
+    def set(self, key, value, stored_at=None):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, stored_at or now, now, len(blob), blob)
+            )
+            self._evict()
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute(
+            "SELECT key, size FROM responses ORDER BY used_at"
+        ).fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+BACKENDS = {
+    "memory": MemoryBackend,
+    "sqlite": SqliteBackend,
+}
+
+
+# ---------------------------------------------------
+# Stale-while-revalidate cache
+# ---------------------------------------------------
+
+class ResponseCache:
+
+    def __init__(self, backend, ttls=None, stale_factor=STALE_FACTOR):
+        self.backend = backend
+        self.ttls = ttls or TTLS
+        self.stale_factor = stale_factor
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0}
+        self._refreshing = set()
+        # asyncio only keeps weak references to tasks; hold the async refreshes until they finish
+        self._refresh_tasks = set()
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+
+    def get_or_fetch(self, source, key, fetch, store_if=None):
+        """Return the cached payload for key, calling fetch() on a miss.
+
+        Fresh entries are returned as is; stale ones are returned immediately
+        and refreshed in the background.
+        """
+        ttl = self.ttls.get(source, DEFAULT_TTL)
+        with metrics.span("cache", source=source):
+            entry = self.backend.get(key)
+
+        if entry is not None:
+            stored_at, value = entry
+            age = time.time() - stored_at
+            if age < ttl:
+                self._count(source, "hits")
+                return value
+            if age < ttl * (1 + self.stale_factor):
+                self._count(source, "stale_hits")
+                self._refresh(source, key, fetch, store_if)
+                return value
+
+        self._count(source, "misses")
+        value = fetch()
+        self._store(key, value, store_if)
+        return value
+
+    async def get_or_fetch_async(self, source, key, fetch, store_if=None):
+        """get_or_fetch for coroutine fetchers: `fetch` returns an awaitable.
+
+        Stale entries are refreshed in a task on the running loop.
+        """
+        ttl = self.ttls.get(source, DEFAULT_TTL)
+        with metrics.span("cache", source=source):
+            entry = self.backend.get(key)
+
+        if entry is not None:
+            stored_at, value = entry
+            age = time.time() - stored_at
+            if age < ttl:
+                self._count(source, "hits")
+                return value
+            if age < ttl * (1 + self.stale_factor):
+                self._count(source, "stale_hits")
+                self._refresh_async(source, key, fetch, store_if)
+                return value
+
+        self._count(source, "misses")
+        value = await fetch()
+        self._store(key, value, store_if)
+        return value
+
+    def peek(self, source, key, refresh=None, store_if=None):
+        """Return a fresh or still-servable cached payload without fetching, else None.
+
+        A None counts as a miss: the caller is expected to fetch and put() instead.
+        A stale entry is still returned; given `refresh` (a fetch() as for
+        get_or_fetch), it is replaced in the background like get_or_fetch does.
+        """
+        ttl = self.ttls.get(source, DEFAULT_TTL)
+        with metrics.span("cache", source=source):
+            entry = self.backend.get(key)
+        if entry is None:
+            self._count(source, "misses")
+            return None
+
+        stored_at, value = entry
+        age = time.time() - stored_at
+        if age < ttl:
+            self._count(source, "hits")
+            return value
+        if age < ttl * (1 + self.stale_factor):
+            self._count(source, "stale_hits")
+            if refresh:
+                self._refresh(source, key, refresh, store_if)
+            return value
+
+        self._count(source, "misses")
+        return None
+
+    def put(self, key, value):
+        self.backend.set(key, value)
+
+    def _store(self, key, value, store_if):
+        if store_if is None or store_if(value):
+            self.backend.set(key, value)
+
+    def _refresh(self, source, key, fetch, store_if):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._store(key, fetch(), store_if)
+                self._count(source, "refreshes")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresher.submit(metrics.propagate(run))
+
+    def _refresh_async(self, source, key, fetch, store_if):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        async def run():
+            try:
+                self._store(key, await fetch(), store_if)
+                self._count(source, "refreshes")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        task = asyncio.ensure_future(run())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    def _count(self, source, name):
+        with self._lock:
+            self.stats[name] += 1
+        metrics.inc("g2t_cache_total", source=source, result=name)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide response cache (backend chosen by G2T_CACHE_BACKEND)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            backend = BACKENDS[os.getenv("G2T_CACHE_BACKEND", "memory")]()
+            _cache = ResponseCache(backend)
+        return _cache
+
+
+def set_backend(backend):
+    """Swap the storage backend of the shared cache (e.g. SqliteBackend(path))."""
+    global _cache
+    with _cache_lock:
+        _cache = ResponseCache(backend)
+
+
+def not_error_message(value):
+    # Fetchers report failures as a plain string; those must not be cached.
+    return not isinstance(value, str)
+
+
+def cache_key(source, *args, **kwargs):
+    """Key a fetcher call is cached under; identical to what @cached(source) uses."""
+    return source + ":" + json.dumps([args, kwargs], sort_keys=True, default=str)
+
+
+def cached(source, store_if=not_error_message):
+    """Decorate a fetcher so its results are cached under `source`'s TTL.
+
+    Cached payloads are shared between callers and must be treated as read-only.
+    """
+    def decorator(fn):
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = cache_key(source, *args, **kwargs)
+            return get_cache().get_or_fetch(
+                source, key, lambda: fn(*args, **kwargs), store_if
+            )
+
+        wrapper.uncached = fn
+        return wrapper
+
+    return decorator
+
+
+def cached_async(source, store_if=not_error_message):
+    """@cached for coroutine fetchers; shares entries with the sync fetcher of the same source and arguments."""
+    def decorator(fn):
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            key = cache_key(source, *args, **kwargs)
+            return await get_cache().get_or_fetch_async(
+                source, key, lambda: fn(*args, **kwargs), store_if
+            )
+
+        wrapper.uncached = fn
+        return wrapper
+
+    return decorator
+
+
+# ---------------------------------------------------
+# Content-addressed model output cache
+# ---------------------------------------------------
+
+SUMMARY_CACHE_BYTES = 64 * 1024 * 1024
+
+_summaries = None
+
+
+def content_key(*parts):
+    """sha256 over the parts; equal inputs always map to the same key."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def get_summary_store():
+    """On-disk store for LLM/summarizer outputs, evicting least recently used past 64 MB."""
+    global _summaries
+    with _cache_lock:
+        if _summaries is None:
+            _summaries = SqliteBackend(cache_path("summaries.sqlite"), max_bytes=SUMMARY_CACHE_BYTES)
+        return _summaries
+
+
+def generation_key(model, template_version, temperature, text):
+    return content_key(model, template_version, temperature, text)
+
+
+def cached_generation(model, template_version, temperature, text, generate):
+    """Return generate() for this (model, template, temperature, input), computing it only once.
+
+    Outputs never expire: the same inputs produce the same text, and any change
+    to the model, prompt template or input gives a new key.
+    """
+    store = get_summary_store()
+    key = generation_key(model, template_version, temperature, text)
+    entry = store.get(key)
+    if entry is not None:
+        metrics.inc("g2t_cache_total", source="generation", result="hits")
+        return entry[1]
+    metrics.inc("g2t_cache_total", source="generation", result="misses")
+    output = generate()
+    store.set(key, output)
+    return output
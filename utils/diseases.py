@@ -1,80 +1,216 @@
 # 📁 utils/diseases.py
-import requests
+import asyncio
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import async_http, http_client, metrics
+from utils.cache import cached, cached_async
+from utils.ensembl import resolve_ensembl_id, resolve_ensembl_id_async
+from utils.ot_store import get_ot_store
+from utils.records import Disease
 
 API_URL = "https://api.platform.opentargets.org/api/v4/graphql"
 
 def get_ensembl_id_from_symbol(gene_symbol):
-    """Convert a gene symbol (e.g., BRCA1) to Ensembl gene ID using Open Targets search API."""
-    query = {
-        "query": """
-            query searchTarget($symbol: String!) {
-              search(queryString: $symbol, entityNames: ["target"], page: {index: 0, size: 1}) {
-                hits {
-                  object {
-                    ... on Target {
-                      id
-                      approvedSymbol
-                    }
-                  }
-                }
-              }
+    """Convert a gene symbol (e.g., BRCA1) to Ensembl gene ID using the shared resolver cache."""
+    ensembl_id = resolve_ensembl_id(gene_symbol)
+
+    if not ensembl_id:
+        raise ValueError(f"No Ensembl ID found for gene symbol: {gene_symbol}")
+
+    return ensembl_id  # e.g. "ENSG00000012048"
+
+
+async def _ensembl_id_async(gene_symbol):
+    ensembl_id = await resolve_ensembl_id_async(gene_symbol)
+    if not ensembl_id:
+        raise ValueError(f"No Ensembl ID found for gene symbol: {gene_symbol}")
+    return ensembl_id
+
+
+def format_disease_rows(rows):
+    """Turn associatedDiseases rows into the Disease records shown in the app."""
+    with metrics.span("build"):
+        return _disease_records(rows)
+
+
+def _disease_records(rows):
+    return [
+        Disease(
+            disease=row['disease']['name'],
+            id=f"[{row['disease']['id']}](https://www.ebi.ac.uk/ols4/ontologies/efo/terms?obo_id={row['disease']['id']})",
+            score=row['score']
+        )
+        for row in rows
+    ]
+
+
+DISEASE_PAGE_QUERY = """
+    query geneInfo($ensemblId: String!, $index: Int!, $size: Int!) {
+      target(ensemblId: $ensemblId) {
+        associatedDiseases(page: {index: $index, size: $size}) {
+          count
+          rows {
+            disease {
+              name
+              id
             }
-        """,
-        "variables": {"symbol": gene_symbol}
+            score
+          }
+        }
+      }
+    }
+"""
+
+PAGE_SIZE = 200
+
+_prefetcher = ThreadPoolExecutor(max_workers=4, thread_name_prefix="disease-pages")
+
+
+def disease_page_body(ensembl_id, index, size=PAGE_SIZE):
+    return {
+        "query": DISEASE_PAGE_QUERY,
+        "variables": {"ensemblId": ensembl_id, "index": index, "size": size}
     }
 
-    res = requests.post(API_URL, json=query)
+
+def parse_disease_page(res):
+    """(total count, rows) from one associatedDiseases response."""
     res.raise_for_status()
-    hits = res.json()["data"]["search"]["hits"]
+    with metrics.span("parse"):
+        associations = res.json()['data']['target']['associatedDiseases']
+    return associations['count'], associations['rows']
+
+
+def fetch_disease_page(ensembl_id, index, size=PAGE_SIZE):
+    """Fetch one associatedDiseases page: returns (total count, rows)."""
+    return parse_disease_page(http_client.post(API_URL, json=disease_page_body(ensembl_id, index, size)))
+
+
+async def fetch_disease_page_async(ensembl_id, index, size=PAGE_SIZE):
+    return parse_disease_page(await async_http.post(API_URL, json=disease_page_body(ensembl_id, index, size)))
 
-    if not hits:
-        raise ValueError(f"No Ensembl ID found for gene symbol: {gene_symbol}")
 
-    return hits[0]["object"]["id"]  # e.g. "ENSG00000012048"
+def limit_rows(rows, min_score=None, top_k=None):
+    """Rows come ordered by score: stop at the first one below `min_score` or after `top_k`."""
+    for yielded, row in enumerate(rows, 1):
+        if min_score is not None and row['score'] < min_score:
+            return
+        yield row
+        if top_k is not None and yielded >= top_k:
+            return
 
 
-def fetch_diseases(gene_symbol):
-    """Fetch associated diseases for a given gene symbol."""
+def iter_disease_associations(ensembl_id, page_size=PAGE_SIZE, min_score=None, top_k=None,
+                              prefetch=True, start_page=0):
+    """Yield every associatedDiseases row for a target, page by page.
+
+    Walking stops at the first row below `min_score` or after `top_k` rows,
+    and no page past that point is requested. With `prefetch`, the next page
+    is already in flight while the current one is consumed.
+    """
+    pages = _iter_pages(ensembl_id, page_size, prefetch, start_page, min_score, top_k)
+    return limit_rows(pages, min_score, top_k)
+
+
+def _needs_next_page(rows, seen, position, count, min_score, top_k):
+    """Whether the page after `rows` is wanted: `seen` rows walked so far, `position`
+    rows into the `count` the target has."""
+    if not rows or position >= count:
+        return False
+    if top_k is not None and seen >= top_k:
+        return False
+    # Rows come best score first, so a page ending below the threshold is the last one needed
+    return min_score is None or rows[-1]['score'] >= min_score
+
+
+def _iter_pages(ensembl_id, page_size, prefetch, start_page, min_score=None, top_k=None):
+    index = start_page
+    seen = 0
+    page = _prefetcher.submit(metrics.propagate(fetch_disease_page), ensembl_id, index, page_size)
+
+    while page is not None:
+        count, rows = page.result()
+        index += 1
+        seen += len(rows)
+
+        has_more = _needs_next_page(rows, seen, index * page_size, count, min_score, top_k)
+        page = None
+        if has_more and prefetch:
+            page = _prefetcher.submit(metrics.propagate(fetch_disease_page), ensembl_id, index, page_size)
+
+        yield from rows
+
+        if has_more and not prefetch:
+            page = _prefetcher.submit(metrics.propagate(fetch_disease_page), ensembl_id, index, page_size)
+
+
+async def disease_associations_async(ensembl_id, page_size=PAGE_SIZE, min_score=None, top_k=None):
+    """Every row iter_disease_associations would yield, as a list.
+
+    The first page gives the total count. Without `min_score` every further
+    page (up to `top_k` rows) is then requested at once; with it, pages are
+    walked in order so none past the threshold is sent.
+    """
+    count, rows = await fetch_disease_page_async(ensembl_id, 0, page_size)
+    if not _needs_next_page(rows, len(rows), page_size, count, min_score, top_k):
+        return list(limit_rows(rows, min_score, top_k))
+
+    if min_score is None:
+        wanted = count if top_k is None else min(count, top_k)
+        pages = await asyncio.gather(*(
+            fetch_disease_page_async(ensembl_id, index, page_size)
+            for index in range(1, math.ceil(wanted / page_size))
+        ))
+        rows = rows + [row for _, page_rows in pages for row in page_rows]
+    else:
+        index = 1
+        rows, page_rows = list(rows), rows
+        while _needs_next_page(page_rows, len(rows), index * page_size, count, min_score, top_k):
+            _, page_rows = await fetch_disease_page_async(ensembl_id, index, page_size)
+            rows.extend(page_rows)
+            index += 1
+    return list(limit_rows(rows, min_score, top_k))
+
+
+@cached("diseases")
+def fetch_diseases(gene_symbol, min_score=None, top_k=None):
+    """Fetch associated diseases for a given gene symbol (all pages unless limited)."""
     try:
+        # Local Open Targets release, when one is configured
+        store = get_ot_store()
+        if store:
+            ensembl_id = store.ensembl_id(gene_symbol) or get_ensembl_id_from_symbol(gene_symbol)
+            return format_disease_rows(store.disease_rows(ensembl_id, min_score=min_score, top_k=top_k))
+
         # Step 1: Get Ensembl ID
         ensembl_id = get_ensembl_id_from_symbol(gene_symbol)
 
-        # Step 2: Fetch diseases using Ensembl ID
-        query = {
-            "query": """
-                query geneInfo($ensemblId: String!) {
-                  target(ensemblId: $ensemblId) {
-                    associatedDiseases(page: {index: 0, size: 100}) {
-                      rows {
-                        disease {
-                          name
-                          id
-                        }
-                        score
-                      }
-                    }
-                  }
-                }
-            """,
-            "variables": {"ensemblId": ensembl_id}
-        }
-
-        res = requests.post(API_URL, json=query)
-        res.raise_for_status()
-        rows = res.json()['data']['target']['associatedDiseases']['rows']
+        # Step 2: Walk every association page for the Ensembl ID
+        rows = iter_disease_associations(ensembl_id, min_score=min_score, top_k=top_k)
 
         # Step 3: Format results
-        diseases = [
-            {
-                "disease": row['disease']['name'],
-                "id": f"[{row['disease']['id']}](https://www.ebi.ac.uk/ols4/ontologies/efo/terms?obo_id={row['disease']['id']})",
-                "score": row['score']
-            }
-            for row in rows
-        ]
+        return format_disease_rows(rows)
+
+    except Exception as e:
+        metrics.error(type(e).__name__)
+        return f"Error fetching diseases: {e}"
+
+
+@cached_async("diseases")
+async def fetch_diseases_async(gene_symbol, min_score=None, top_k=None):
+    """fetch_diseases without a thread per request; same records or error string."""
+    try:
+        store = get_ot_store()
+        if store:
+            ensembl_id = store.ensembl_id(gene_symbol) or await _ensembl_id_async(gene_symbol)
+            return format_disease_rows(store.disease_rows(ensembl_id, min_score=min_score, top_k=top_k))
 
-        return diseases
+        ensembl_id = await _ensembl_id_async(gene_symbol)
+        rows = await disease_associations_async(ensembl_id, min_score=min_score, top_k=top_k)
+        return format_disease_rows(rows)
 
     except Exception as e:
+        metrics.error(type(e).__name__)
         return f"Error fetching diseases: {e}"    
                 
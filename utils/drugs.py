@@ -1,8 +1,14 @@
 # 📁 utils/drugs.py
 
-import requests
+import logging
+
 import pandas as pd
 
+from utils import async_http, http_client, metrics
+from utils.cache import cached, cached_async
+from utils.ensembl import resolve_ensembl_id, resolve_ensembl_id_async
+from utils.ot_store import get_ot_store
+
 
 # -------------------------------------------------------
 # CONFIG
@@ -17,91 +23,140 @@ CHEMBL_API = (
 )
 
 
-HEADERS = {
-    "User-Agent": "Gene2Trials/1.0"
-}
+log = logging.getLogger(__name__)
 
 
 # -------------------------------------------------------
 # SAFE REQUESTS
 # -------------------------------------------------------
 
+def graphql_body(query, variables=None):
+
+    return {
+        "query": query,
+        "variables": variables or {}
+    }
+
+
 def safe_post(query, variables=None):
 
     try:
 
-        response = requests.post(
-            OPENTARGETS_API,
-            json={
-                "query": query,
-                "variables": variables or {}
-            },
-            headers=HEADERS,
-            timeout=30
+        return graphql_data(
+            http_client.post(
+                OPENTARGETS_API,
+                json=graphql_body(query, variables)
+            )
         )
 
 
-        if response.status_code != 200:
+    except Exception as e:
 
-            print(
-                "OpenTargets Error:",
-                response.text
-            )
+        return _request_failed(e)
 
-            return None
 
 
-        data = response.json()
 
+async def safe_post_async(query, variables=None):
 
-        if "errors" in data:
+    try:
 
-            print(
-                "GraphQL Error:",
-                data["errors"]
+        return graphql_data(
+            await async_http.post(
+                OPENTARGETS_API,
+                json=graphql_body(query, variables)
             )
+        )
 
-            return None
 
+    except Exception as e:
 
-        return data
+        return _request_failed(e)
 
 
-    except Exception as e:
 
-        print(
-            "OpenTargets Exception:",
-            e
+
+def _request_failed(e):
+
+    metrics.error(type(e).__name__)
+
+    log.warning(
+        "OpenTargets request failed: %s",
+        e
+    )
+
+    return None
+
+
+
+
+def graphql_data(response):
+
+    # Shared by the sync and async paths: the JSON body, or None on any error
+
+    if response.status_code != 200:
+
+        metrics.error(f"http_{response.status_code}")
+
+        log.warning(
+            "OpenTargets error %s: %s",
+            response.status_code,
+            response.text[:500]
+        )
+
+        return None
+
+
+    with metrics.span("parse"):
+
+        data = response.json()
+
+
+    if "errors" in data:
+
+        metrics.error("graphql")
+
+        log.warning(
+            "OpenTargets GraphQL error: %s",
+            data["errors"]
         )
 
         return None
 
 
+    return data
+
+
 
 
 def safe_get(url):
 
     try:
 
-        response = requests.get(
-            url,
-            headers=HEADERS,
-            timeout=20
+        response = http_client.get(
+            url
         )
 
 
         if response.status_code == 200:
 
-            return response.json()
+            with metrics.span("parse"):
+
+                return response.json()
+
 
+        metrics.error(f"http_{response.status_code}")
 
         return None
 
 
     except Exception as e:
 
-        print(
-            "Request Error:",
+        metrics.error(type(e).__name__)
+
+        log.warning(
+            "Request to %s failed: %s",
+            url,
             e
         )
 
@@ -116,77 +171,50 @@ def safe_get(url):
 
 def get_ensembl_id_from_symbol(gene_symbol):
 
+    # Shared with utils/diseases.py, so a lookup resolves each symbol once.
+    # Lookup failures raise, so they are not mistaken for unknown symbols.
 
-    query = """
-    query searchTarget($symbol:String!){
-      search(
-        queryString:$symbol,
-        entityNames:["target"],
-        page:{
-          index:0,
-          size:1
-        }
-      ){
-        hits{
-          object{
-            ... on Target{
-              id
-              approvedSymbol
-            }
-          }
-        }
-      }
-    }
-    """
-
-
-    result = safe_post(
-        query,
-        {
-            "symbol":gene_symbol
-        }
+    return resolve_ensembl_id(
+        gene_symbol
     )
 
 
-    try:
 
-        return (
-            result["data"]
-            ["search"]
-            ["hits"][0]
-            ["object"]
-            ["id"]
-        )
 
+def no_ensembl_id(gene_symbol):
 
-    except:
+    return (
+        f"No Ensembl ID found for gene symbol: {gene_symbol}"
+    )
 
-        return None
 
 
 
-# -------------------------------------------------------
-# STEP 2
-# OPENTARGETS DRUG CANDIDATES
-# -------------------------------------------------------
+# Fetch failures come back as this message instead of a table
+FETCH_FAILED = (
+    "Error fetching drugs: Open Targets request failed"
+)
 
-def fetch_opentarget_drugs(gene_symbol):
 
 
-    ensembl_id = get_ensembl_id_from_symbol(
-        gene_symbol
-    )
 
+def _has_rows(df):
 
-    if not ensembl_id:
+    # Error messages and empty tables are never cached
 
-        return pd.DataFrame()
+    return (
+        isinstance(df, pd.DataFrame)
+        and not df.empty
+    )
 
 
 
-    query = """
-    query getDrugCandidates($id:String!){
-      target(ensemblId:$id){
+# -------------------------------------------------------
+# STEP 2
+# OPENTARGETS DRUG CANDIDATES
+# -------------------------------------------------------
+
+DRUG_CANDIDATE_FIELDS = """
         drugAndClinicalCandidates{
           rows{
             id
@@ -204,35 +232,20 @@ def fetch_opentarget_drugs(gene_symbol):
             }
           }
         }
+"""
+
+
+DRUG_CANDIDATES_QUERY = """
+    query getDrugCandidates($id:String!){
+      target(ensemblId:$id){
+    """ + DRUG_CANDIDATE_FIELDS + """
       }
     }
     """
 
 
 
-    result = safe_post(
-        query,
-        {
-            "id":ensembl_id
-        }
-    )
-
-
-    if not result:
-
-        return pd.DataFrame()
-
-
-
-    rows = (
-
-        result["data"]
-        ["target"]
-        ["drugAndClinicalCandidates"]
-        ["rows"]
-
-    )
-
+def format_drug_rows(rows):
 
 
     output=[]
@@ -311,6 +324,165 @@ def fetch_opentarget_drugs(gene_symbol):
 
     return pd.DataFrame(output)
 
+
+
+
+@cached(
+    "drugs",
+    store_if=_has_rows
+)
+def fetch_opentarget_drugs(gene_symbol):
+
+
+    # Drug candidate table, or an error message when the symbol
+    # does not resolve or Open Targets fails (like fetch_diseases)
+
+    store = get_ot_store()
+
+    ensembl_id = store.ensembl_id(gene_symbol) if store else None
+
+    if not ensembl_id:
+
+        try:
+
+            ensembl_id = get_ensembl_id_from_symbol(
+                gene_symbol
+            )
+
+        except Exception as e:
+
+            _request_failed(e)
+
+            return FETCH_FAILED
+
+
+    if not ensembl_id:
+
+        return no_ensembl_id(gene_symbol)
+
+
+    # Local Open Targets release, when one is configured
+
+    if store:
+
+        with metrics.span("frame"):
+
+            return format_drug_rows(
+                store.drug_rows(ensembl_id)
+            )
+
+
+
+    result = safe_post(
+        DRUG_CANDIDATES_QUERY,
+        {
+            "id":ensembl_id
+        }
+    )
+
+
+    if result is None:
+
+        return FETCH_FAILED
+
+
+    return drug_candidates_frame(
+        result
+    )
+
+
+
+
+@cached_async(
+    "drugs",
+    store_if=_has_rows
+)
+async def fetch_opentarget_drugs_async(gene_symbol):
+
+
+    # fetch_opentarget_drugs over utils.async_http
+
+    store = get_ot_store()
+
+    ensembl_id = store.ensembl_id(gene_symbol) if store else None
+
+    if not ensembl_id:
+
+        try:
+
+            ensembl_id = await resolve_ensembl_id_async(
+                gene_symbol
+            )
+
+        except Exception as e:
+
+            _request_failed(e)
+
+            return FETCH_FAILED
+
+
+    if not ensembl_id:
+
+        return no_ensembl_id(gene_symbol)
+
+
+    if store:
+
+        with metrics.span("frame"):
+
+            return format_drug_rows(
+                store.drug_rows(ensembl_id)
+            )
+
+
+
+    result = await safe_post_async(
+        DRUG_CANDIDATES_QUERY,
+        {
+            "id":ensembl_id
+        }
+    )
+
+
+    if result is None:
+
+        return FETCH_FAILED
+
+
+    return drug_candidates_frame(
+        result
+    )
+
+
+
+
+def drug_candidates_frame(result):
+
+
+    if not result:
+
+        return pd.DataFrame()
+
+
+
+    rows = (
+
+        result["data"]
+        ["target"]
+        ["drugAndClinicalCandidates"]
+        ["rows"]
+
+    )
+
+
+
+    with metrics.span("frame"):
+
+        return format_drug_rows(
+            rows
+        )
+
+
 # -------------------------------------------------------
 # FINAL FUNCTION
 # -------------------------------------------------------
@@ -318,12 +490,33 @@ def fetch_opentarget_drugs(gene_symbol):
 def fetch_drugs_for_gene(gene):
 
 
-    df = fetch_opentarget_drugs(
-        gene
+    return _drugs_table(
+        fetch_opentarget_drugs(
+            gene
+        )
+    )
+
+
+
+
+async def fetch_drugs_for_gene_async(gene):
+
+
+    return _drugs_table(
+        await fetch_opentarget_drugs_async(
+            gene
+        )
     )
 
 
-    if df.empty:
+
+
+def _drugs_table(df):
+
+
+    # The tab shows one placeholder row for errors and empty results alike
+
+    if isinstance(df, str) or df.empty:
 
         return pd.DataFrame([{
 
@@ -345,8 +538,9 @@ def fetch_drugs_for_gene(gene):
         }])
 
 
-    df["Source"] = (
-        "OpenTargets"
+    # Cached frames are shared, so copy instead of assigning in place
+    df = df.assign(
+        Source="OpenTargets"
     )
 
 
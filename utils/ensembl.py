@@ -0,0 +1,153 @@
+# 📁 utils/ensembl.py
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from utils import async_http, http_client, metrics
+from utils.settings import cache_path
+
+API_URL = "https://api.platform.opentargets.org/api/v4/graphql"
+
+SEARCH_QUERY = """
+    query searchTarget($symbol: String!) {
+      search(queryString: $symbol, entityNames: ["target"], page: {index: 0, size: 1}) {
+        hits {
+          object {
+            ... on Target {
+              id
+              approvedSymbol
+            }
+          }
+        }
+      }
+    }
+"""
+
+MEMORY_SIZE = 4096
+TTL_SECONDS = 30 * 24 * 3600  # symbol → Ensembl mappings change very rarely
+
+
+class EnsemblResolver:
+    """Gene symbol → Ensembl ID lookup with an in-process LRU in front of a SQLite store."""
+
+    def __init__(self, db_path=None, memory_size=MEMORY_SIZE, ttl=TTL_SECONDS):
+        self.db_path = db_path or cache_path("ensembl_ids.sqlite")
+        self.memory_size = memory_size
+        self.ttl = ttl
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS ensembl_ids ("
+            "symbol TEXT PRIMARY KEY, ensembl_id TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def resolve(self, gene_symbol):
+        """Return the Ensembl ID for gene_symbol, or None if Open Targets has no match."""
+        ensembl_id = self.cached(gene_symbol)
+        if ensembl_id:
+            return ensembl_id
+
+        ensembl_id = self._search(gene_symbol)
+        if ensembl_id:
+            self.store(gene_symbol, ensembl_id)
+        return ensembl_id
+
+    def cached(self, gene_symbol):
+        """Return the cached Ensembl ID for gene_symbol without touching the network."""
+        key = gene_symbol.strip().upper()
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self._memory[key]
+
+            row = self._db.execute(
+                "SELECT ensembl_id, fetched_at FROM ensembl_ids WHERE symbol = ?", (key,)
+            ).fetchone()
+            if row and time.time() - row[1] < self.ttl:
+                self.stats["disk_hits"] += 1
+                self._remember(key, row[0])
+                return row[0]
+
+            self.stats["misses"] += 1
+            return None
+
+    def store(self, gene_symbol, ensembl_id):
+        """Record a resolved ID in both cache tiers."""
+        key = gene_symbol.strip().upper()
+        with self._lock:
+            self._remember(key, ensembl_id)
+            self._db.execute(
+                "INSERT OR REPLACE INTO ensembl_ids VALUES (?, ?, ?)",
+                (key, ensembl_id, time.time())
+            )
+            self._db.commit()
+
+    def _remember(self, key, ensembl_id):
+        self._memory[key] = ensembl_id
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    async def resolve_async(self, gene_symbol):
+        """resolve() with the Open Targets search sent through utils.async_http."""
+        ensembl_id = self.cached(gene_symbol)
+        if ensembl_id:
+            return ensembl_id
+
+        res = await async_http.post(API_URL, json=search_body(gene_symbol))
+        res.raise_for_status()
+        ensembl_id = parse_search(res)
+        if ensembl_id:
+            self.store(gene_symbol, ensembl_id)
+        return ensembl_id
+
+    def _search(self, gene_symbol):
+        res = http_client.post(API_URL, json=search_body(gene_symbol))
+        res.raise_for_status()
+        return parse_search(res)
+
+
+def search_body(gene_symbol):
+    return {"query": SEARCH_QUERY, "variables": {"symbol": gene_symbol}}
+
+
+def parse_search(res):
+    """Ensembl ID of the best search hit in an Open Targets response, or None."""
+    with metrics.span("parse"):
+        hits = res.json()["data"]["search"]["hits"]
+    if not hits:
+        return None
+    return hits[0]["object"]["id"]  # e.g. "ENSG00000012048"
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver():
+    """Return the process-wide resolver, shared by every fetcher and Streamlit session."""
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = EnsemblResolver()
+        return _resolver
+
+
+def resolve_ensembl_id(gene_symbol):
+    """Convert a gene symbol (e.g., BRCA1) to its Ensembl gene ID, or None if unknown."""
+    return get_resolver().resolve(gene_symbol)
+
+
+async def resolve_ensembl_id_async(gene_symbol):
+    return await get_resolver().resolve_async(gene_symbol)
+
+
+def cache_stats():
+    """Hit/miss counters of the shared resolver."""
+    return dict(get_resolver().stats)
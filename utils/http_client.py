@@ -0,0 +1,281 @@
+# 📁 utils/http_client.py
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import metrics
+
+HEADERS = {
+    "User-Agent": "Gene2Trials/1.0"
+}
+
+# (connect, read) timeouts, the most requests we keep in flight per upstream, and
+# the request rate (per second, with bursts up to `burst`) the whole process keeps
+# to, so concurrent Streamlit sessions share one budget per upstream.
+HOSTS = {
+    "myvariant.info": {"timeout": (5, 30), "max_concurrency": 8, "rate": 20, "burst": 40},
+    "api.platform.opentargets.org": {"timeout": (5, 30), "max_concurrency": 8, "rate": 10, "burst": 20},
+    # ClinicalTrials.gov asks for about 50 requests per minute per client
+    "clinicaltrials.gov": {"timeout": (5, 30), "max_concurrency": 4, "rate": 50 / 60, "burst": 10},
+    "eutils.ncbi.nlm.nih.gov": {
+        "timeout": (5, 60),
+        "max_concurrency": 3,
+        # NCBI allows 3 requests/s per client, 10/s with an API key
+        "rate": 10 if os.getenv("NCBI_API_KEY") else 3,
+    },
+    "www.ebi.ac.uk": {"timeout": (5, 20), "max_concurrency": 4, "rate": 10},
+}
+DEFAULT_HOST = {"timeout": (5, 30), "max_concurrency": 4}
+
+# Identical concurrent requests with these methods share one upstream call.
+# Open Targets is GraphQL, so its read-only queries are POSTs.
+COALESCED_METHODS = {"GET", "POST"}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+_sessions = {}
+_semaphores = {}
+_limiters = {}
+_lock = threading.Lock()
+
+# Set by install_adapter(); replaces the pooled HTTPAdapter for every host
+_adapter = None
+_rate_limits = True
+
+
+class TokenBucket:
+    """Allow `rate` acquisitions per second on average, with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return 0, or return the seconds to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        while wait:
+            time.sleep(wait)
+            wait = self.reserve()
+
+
+def host_config(host):
+    return HOSTS.get(host, DEFAULT_HOST)
+
+
+def get_session(host):
+    """Return the keep-alive session for host, creating its connection pool on first use."""
+    with _lock:
+        if host not in _sessions:
+            size = host_config(host)["max_concurrency"]
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            adapter = _adapter or HTTPAdapter(pool_connections=1, pool_maxsize=size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[host] = session
+            _semaphores[host] = threading.BoundedSemaphore(size)
+        return _sessions[host]
+
+
+def get_limiter(host):
+    """The process-wide token bucket for host (shared with utils.async_http), or None."""
+    with _lock:
+        config = host_config(host)
+        if host not in _limiters and config.get("rate") and _rate_limits:
+            _limiters[host] = TokenBucket(config["rate"], config.get("burst"))
+        return _limiters.get(host)
+
+
+def install_adapter(adapter, rate_limits=True):
+    """Send every request through `adapter` (a requests transport adapter), or back to
+    the network with None. Used by the offline benchmarks to replay recorded responses.
+    """
+    global _adapter
+    with _lock:
+        _adapter = adapter
+        _sessions.clear()
+        _semaphores.clear()
+    set_rate_limits(rate_limits)
+
+
+def set_rate_limits(enabled):
+    """Turn the per-host token buckets on or off (off when replaying offline)."""
+    global _rate_limits
+    with _lock:
+        _rate_limits = enabled
+        _limiters.clear()
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Seconds to wait before retry number `attempt` (0-based): exponential with full jitter."""
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _body_size(response, streamed):
+    # A streamed body has not been read yet; fall back to the declared length
+    if not streamed:
+        return len(response.content)
+    try:
+        return int(response.headers.get("Content-Length"))
+    except (TypeError, ValueError):
+        return 0
+
+
+class SingleFlight:
+    """Run one call per key at a time; callers arriving meanwhile get the same result."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return fn()'s result, or that of the identical call already in flight.
+
+        The second value is True when the result came from another caller's call.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+_flights = SingleFlight()
+
+
+def request_key(method, url, **kwargs):
+    """Normalized method + URL (query sorted, params merged in) + body digest."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    params = kwargs.get("params")
+    if params:
+        query += list(params.items()) if isinstance(params, dict) else list(params)
+    normalized = urlunsplit((
+        parts.scheme, (parts.hostname or "").lower() + (f":{parts.port}" if parts.port else ""),
+        parts.path or "/", urlencode(sorted((str(k), str(v)) for k, v in query)), ""
+    ))
+
+    body = b""
+    if kwargs.get("json") is not None:
+        body = json.dumps(kwargs["json"], sort_keys=True, separators=(",", ":")).encode()
+    elif kwargs.get("data") is not None:
+        data = kwargs["data"]
+        body = data if isinstance(data, bytes) else str(data).encode()
+    return f"{method.upper()} {normalized} {hashlib.sha256(body).hexdigest()}"
+
+
+def request(method, url, max_retries=MAX_RETRIES, **kwargs):
+    """Send a request through the pooled session for the URL's host.
+
+    Identical GET/POST requests made while one is already in flight (from any
+    thread or Streamlit session) wait for it and share its response, which must
+    therefore be treated as read-only. Streamed requests are never shared.
+    """
+    if kwargs.get("stream") or method.upper() not in COALESCED_METHODS:
+        return _send(method, url, max_retries, **kwargs)
+
+    response, shared = _flights.do(
+        request_key(method, url, **kwargs),
+        lambda: _send(method, url, max_retries, **kwargs)
+    )
+    if shared:
+        metrics.inc("g2t_http_coalesced_total", host=urlsplit(url).hostname)
+    return response
+
+
+def _send(method, url, max_retries=MAX_RETRIES, **kwargs):
+    """Connection errors, timeouts and 429/5xx responses are retried with backoff;
+    the last response (or exception) is returned (or raised) once retries run out.
+    """
+    host = urlsplit(url).hostname
+    session = get_session(host)
+    kwargs.setdefault("timeout", host_config(host)["timeout"])
+
+    limiter = get_limiter(host)
+
+    for attempt in range(max_retries + 1):
+        if limiter:
+            with metrics.span("rate_limit", host=host):
+                limiter.acquire()
+        try:
+            with _semaphores[host], metrics.span("network", host=host, attempt=attempt) as attrs:
+                response = session.request(method, url, **kwargs)
+                attrs["status"] = response.status_code
+                attrs["bytes"] = _body_size(response, kwargs.get("stream"))
+        except (requests.ConnectionError, requests.Timeout) as e:
+            metrics.inc("g2t_http_requests_total", host=host, status=type(e).__name__)
+            if attempt == max_retries:
+                raise
+            metrics.inc("g2t_http_retries_total", host=host)
+            with metrics.span("backoff", host=host):
+                time.sleep(backoff_delay(attempt))
+            continue
+
+        metrics.inc("g2t_http_requests_total", host=host, status=response.status_code)
+        metrics.inc("g2t_http_bytes_total", attrs["bytes"], host=host)
+
+        if response.status_code in RETRY_STATUSES and attempt < max_retries:
+            metrics.inc("g2t_http_retries_total", host=host)
+            delay = backoff_delay(attempt, _retry_after(response))
+            response.close()
+            with metrics.span("backoff", host=host):
+                time.sleep(delay)
+            continue
+
+        return response
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
@@ -0,0 +1,63 @@
+# 📁 utils/lookup.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils import metrics
+from utils.mutations import fetch_mutations, fetch_mutations_async
+from utils.diseases import fetch_diseases, fetch_diseases_async
+from utils.drugs import fetch_drugs_for_gene, fetch_drugs_for_gene_async
+from utils.trials import fetch_clinical_trials, fetch_clinical_trials_async, open_trial_stream
+from utils.summarizer import fetch_pubmed_abstracts, fetch_pubmed_abstracts_async
+
+# One fetcher per tab. Every entry only talks to its own upstream, so they can all run at once.
+SOURCES = {
+    "mutations": fetch_mutations,
+    "diseases": fetch_diseases,
+    "drugs": fetch_drugs_for_gene,
+    "trials": fetch_clinical_trials,
+    "literature": fetch_pubmed_abstracts,
+}
+
+# Coroutine versions of SOURCES for batch jobs and the API: same results, no thread per request.
+ASYNC_SOURCES = {
+    "mutations": fetch_mutations_async,
+    "diseases": fetch_diseases_async,
+    "drugs": fetch_drugs_for_gene_async,
+    "trials": fetch_clinical_trials_async,
+    "literature": fetch_pubmed_abstracts_async,
+}
+
+# Tabs that fill in progressively get a (first chunk, iterator over the rest) pair instead.
+STREAMED = {
+    "trials": open_trial_stream,
+}
+
+# Shared by every Streamlit session; the work is network-bound so threads are enough.
+_executor = ThreadPoolExecutor(max_workers=4 * len(SOURCES), thread_name_prefix="gene-lookup")
+
+
+def start_gene_lookup(gene_symbol, sources=None, trace=None):
+    """Submit every source fetch for gene_symbol at once and return {source: Future}.
+
+    With a metrics.Trace, every span the fetches record is collected in it.
+    """
+    names = sources or list(SOURCES)
+    trace = trace or metrics.Trace(gene_symbol)
+    return {
+        name: _executor.submit(metrics.traced(trace, name, STREAMED.get(name, SOURCES[name])), gene_symbol)
+        for name in names
+    }
+
+
+def iter_completed(lookup):
+    """Yield (source, future) pairs from a lookup in the order the fetches finish."""
+    by_future = {future: name for name, future in lookup.items()}
+    for future in as_completed(by_future):
+        yield by_future[future], future
+
+
+async def gene_lookup_async(gene_symbol, sources=None):
+    """Run every source for gene_symbol concurrently on the running loop; returns {source: result}."""
+    names = sources or list(ASYNC_SOURCES)
+    results = await asyncio.gather(*(ASYNC_SOURCES[name](gene_symbol) for name in names))
+    return dict(zip(names, results))
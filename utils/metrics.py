@@ -0,0 +1,215 @@
+# 📁 utils/metrics.py
+"""Timing spans, counters and per-lookup traces for every upstream and parser.
+
+    with metrics.span("parse"):
+        data = res.json()
+
+Spans are tagged with the source (mutations, diseases, ...) of the lookup
+running on the current thread and land in two places: process-wide
+aggregates, exported by prometheus_text() / json_lines(), and the Trace of
+the lookup, which the diagnostics sidebar draws as a waterfall. Set
+G2T_METRICS_LOG to a file to also append every span there as a JSON line.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+
+_trace = contextvars.ContextVar("g2t_trace", default=None)
+_source = contextvars.ContextVar("g2t_source", default=None)
+
+_lock = threading.Lock()
+_counters = {}
+_timings = {}
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def current_source():
+    return _source.get() or "other"
+
+
+# ---------------------------------------------------
+# Recording
+# ---------------------------------------------------
+
+def inc(name, value=1, **labels):
+    """Add value to the counter name{labels}."""
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    """Record one duration under name{labels} (exported as a Prometheus summary)."""
+    key = (name, _labels(labels))
+    with _lock:
+        count, total = _timings.get(key, (0, 0.0))
+        _timings[key] = (count + 1, total + seconds)
+
+
+@contextlib.contextmanager
+def span(phase, source=None, **attrs):
+    """Time the block as `phase` of `source` (default: the source of the current lookup).
+
+    attrs (host, bytes, ...) go into the trace and the JSON log; only source
+    and phase label the aggregate timing.
+    """
+    source = source or current_source()
+    started = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        ended = time.perf_counter()
+        observe("g2t_span_seconds", ended - started, source=source, phase=phase)
+        trace = _trace.get()
+        if trace is not None:
+            trace.add(source, phase, started, ended, attrs)
+        _log_span(source, phase, started, ended, attrs)
+
+
+def _log_span(source, phase, started, ended, attrs):
+    path = os.getenv("G2T_METRICS_LOG")
+    if not path:
+        return
+    line = json.dumps({
+        "ts": time.time(), "source": source, "phase": phase,
+        "seconds": round(ended - started, 6), **attrs,
+    }, default=str)
+    with _lock, open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+def error(kind, source=None):
+    """Count a failure that was turned into an error value instead of raised."""
+    inc("g2t_errors_total", source=source or current_source(), kind=kind)
+
+
+# ---------------------------------------------------
+# Per-lookup traces
+# ---------------------------------------------------
+
+class Trace:
+    """All spans recorded while one gene lookup ran, for the waterfall view."""
+
+    def __init__(self, name=""):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, source, phase, started, ended, attrs=None):
+        with self._lock:
+            self.spans.append({
+                "source": source,
+                "phase": phase,
+                "start_ms": (started - self.started) * 1000,
+                "end_ms": (ended - self.started) * 1000,
+                **(attrs or {}),
+            })
+
+    def rows(self):
+        with self._lock:
+            rows = [dict(s, duration_ms=s["end_ms"] - s["start_ms"]) for s in self.spans]
+        return sorted(rows, key=lambda r: r["start_ms"])
+
+
+@contextlib.contextmanager
+def tracing(trace, source):
+    """Attribute everything recorded in the block to `source` of `trace`."""
+    trace_token = _trace.set(trace)
+    source_token = _source.set(source)
+    try:
+        yield
+    finally:
+        _source.reset(source_token)
+        _trace.reset(trace_token)
+
+
+def traced(trace, source, fn):
+    """Wrap fn so that, on whatever thread it runs, it is traced as one `total` span of source."""
+    def run(*args, **kwargs):
+        with tracing(trace, source):
+            with span("total"):
+                return fn(*args, **kwargs)
+    return run
+
+
+def propagate(fn):
+    """Carry the caller's trace and source into fn when it runs on another thread (e.g. a prefetch pool)."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.run(fn, *args, **kwargs)
+    return run
+
+
+# ---------------------------------------------------
+# Export
+# ---------------------------------------------------
+
+def snapshot():
+    with _lock:
+        return dict(_counters), dict(_timings)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+def prometheus_text():
+    """All metrics in the Prometheus text exposition format."""
+    counters, timings = snapshot()
+    lines = []
+    for name in sorted({n for n, _ in counters}):
+        lines.append(f"# TYPE {name} counter")
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    for name in sorted({n for n, _ in timings}):
+        lines.append(f"# TYPE {name} summary")
+        for (n, labels), (count, total) in sorted(timings.items()):
+            if n == name:
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+    return "\n".join(lines) + "\n"
+
+
+def json_lines():
+    """All metrics as JSON lines, one object per series."""
+    counters, timings = snapshot()
+    out = []
+    for (name, labels), value in sorted(counters.items()):
+        out.append(json.dumps({"metric": name, **dict(labels), "value": value}))
+    for (name, labels), (count, total) in sorted(timings.items()):
+        out.append(json.dumps({"metric": name, **dict(labels), "count": count, "sum": round(total, 6)}))
+    return "\n".join(out) + "\n"
+
+
+def cache_hit_ratios():
+    """{source: share of lookups served from cache (fresh or stale)}."""
+    counters, _ = snapshot()
+    totals, hits = {}, {}
+    for (name, labels), value in counters.items():
+        if name != "g2t_cache_total":
+            continue
+        labels = dict(labels)
+        if labels["result"] == "refreshes":
+            continue
+        source = labels["source"]
+        totals[source] = totals.get(source, 0) + value
+        if labels["result"] in ("hits", "stale_hits"):
+            hits[source] = hits.get(source, 0) + value
+    return {source: hits.get(source, 0) / total for source, total in sorted(totals.items()) if total}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timings.clear()
@@ -1,79 +1,192 @@
 # 📁 utils/mutations.py
-import requests
+import numpy as np
+import pandas as pd
 
-def fetch_mutations(gene_symbol):
+from utils import async_http, http_client, metrics
+from utils.cache import cached, cached_async
+
+MYVARIANT_QUERY = "https://myvariant.info/v1/query"
+FIELDS = "dbsnp,cadd,snpeff,hgvs"
+
+# Only variants annotated to the gene itself, not every document mentioning the symbol
+GENE_QUERY = "snpeff.ann.genename:{gene}"
+
+SCROLL_BATCH = 1000  # MyVariant returns at most 1000 hits per fetch_all/scroll page
+MAX_VARIANTS = 10000
+
+
+def variant_query_params(gene_symbol, max_records=MAX_VARIANTS):
+    """Params of the first MyVariant request: one sized page, or the start of a fetch_all scroll."""
+    params = {"q": GENE_QUERY.format(gene=gene_symbol), "fields": FIELDS}
+    if max_records is not None and max_records <= SCROLL_BATCH:
+        params["size"] = max_records
+    else:
+        params["fetch_all"] = "true"
+    return params
+
+
+def end_of_scroll(res):
+    """MyVariant's answer to a scroll past its last page: {"success": false, "error": "No results to return."}."""
+    try:
+        body = res.json()
+    except ValueError:
+        return False
+    return isinstance(body, dict) and body.get("success") is False and "No results" in str(body.get("error"))
+
+
+def next_variant_page(res, params, remaining):
+    """Parse one response: (hits to keep, records still wanted, params of the next scroll or None).
+
+    Any other failed page raises, so a truncated walk is never mistaken for a complete one.
+    """
+    if "scroll_id" in params and res.status_code != 200 and end_of_scroll(res):
+        return [], remaining, None
+    res.raise_for_status()
+    with metrics.span("parse"):
+        data = res.json()
+    hits = data.get("hits", [])
+
+    if remaining is not None:
+        hits = hits[:remaining]
+        remaining -= len(hits)
+
+    scroll_id = data.get("_scroll_id")
+    if not hits or not scroll_id or remaining == 0:
+        return hits, remaining, None
+    return hits, remaining, {"scroll_id": scroll_id}
+
+
+def iter_variant_hits(gene_symbol, max_records=MAX_VARIANTS):
+    """Yield raw MyVariant hits in chunks of up to 1000, scrolling through fetch_all pages."""
+    params = variant_query_params(gene_symbol, max_records)
+    remaining = max_records
+    while params:
+        res = http_client.get(MYVARIANT_QUERY, params=params)
+        hits, remaining, params = next_variant_page(res, params, remaining)
+        if hits:
+            yield hits
+
+
+async def iter_variant_hits_async(gene_symbol, max_records=MAX_VARIANTS):
+    """iter_variant_hits over utils.async_http."""
+    params = variant_query_params(gene_symbol, max_records)
+    remaining = max_records
+    while params:
+        res = await async_http.get(MYVARIANT_QUERY, params=params)
+        hits, remaining, params = next_variant_page(res, params, remaining)
+        if hits:
+            yield hits
+
+
+COLUMNS = ["variant_id", "mutation_name", "dbsnp", "cadd_score", "risk_level"]
+
+
+def _rsid(hit):
+    # --- dbSNP rsID ---
+    rsid = (hit.get("dbsnp") or {}).get("rsid")
+    if isinstance(rsid, list):
+        return ", ".join(rsid)
+    return rsid or "N/A"
+
+
+def _cadd_phred(hit):
+    cadd_data = hit.get("cadd")
+    return cadd_data.get("phred") if isinstance(cadd_data, dict) else None
+
+
+def _mutation_name(hit):
+    # --- Mutation name (protein-level) ---
+
+    # 1. Check snpEff
+    snpeff_data = hit.get("snpeff", {})
+    if isinstance(snpeff_data, dict):
+        ann = snpeff_data.get("ann", [])
+        if isinstance(ann, dict):
+            ann = [ann]
+        if isinstance(ann, list):
+            for entry in ann:
+                if isinstance(entry, dict) and "hgvs_p" in entry:
+                    return entry["hgvs_p"]
+
+    # 2. Fallback: HGVS strings
+    hgvs_data = hit.get("hgvs", [])
+    if isinstance(hgvs_data, str):
+        hgvs_data = [hgvs_data]
+    if isinstance(hgvs_data, list):
+        for item in hgvs_data:
+            if isinstance(item, str) and "p." in item:
+                return item.split(":")[-1]
+
+    return "N/A"
+
+
+def hits_to_frame(hits):
+    """Parse a chunk of MyVariant hits into one DataFrame, column by column.
+
+    Only the nested-JSON lookups touch individual hits; CADD coercion, risk
+    binning and link building run vectorized over whole columns.
+    """
+    if not hits:
+        return pd.DataFrame(columns=COLUMNS)
+
+    ids = pd.Series([hit.get("_id") for hit in hits], dtype=object)
+
+    # --- CADD score: float column, NaN where missing or not numeric ---
+    cadd_score = pd.to_numeric(pd.Series([_cadd_phred(hit) for hit in hits], dtype=object), errors="coerce")
+
+    # --- Risk level classification ---
+    risk_level = np.select(
+        [cadd_score >= 20, cadd_score >= 10, cadd_score.notna()],
+        ["🔴 High", "🟡 Moderate", "🟢 Low"],
+        default="N/A"
+    )
+
+    # ✅ Make variant_id clickable (to MyVariant.info)
+    variant_id = (
+        '<a href="https://myvariant.info/v1/variant/' + ids + '" target="_blank">' + ids + '</a>'
+    ).fillna("N/A")
+
+    return pd.DataFrame({
+        "variant_id": variant_id,
+        "mutation_name": [_mutation_name(hit) for hit in hits],
+        "dbsnp": [_rsid(hit) for hit in hits],
+        "cadd_score": cadd_score.astype(float),
+        "risk_level": risk_level
+    }, columns=COLUMNS)
+
+
+def iter_mutations(gene_symbol, max_records=MAX_VARIANTS):
+    """Yield one parsed DataFrame per chunk, so large genes never sit in memory as raw JSON."""
+    for hits in iter_variant_hits(gene_symbol, max_records):
+        with metrics.span("frame"):
+            frame = hits_to_frame(hits)
+        yield frame
+
+
+@cached("mutations")
+def fetch_mutations(gene_symbol, max_records=MAX_VARIANTS):
+    """Variants of a gene as a DataFrame (cadd_score is a float column, NaN when unknown)."""
+    try:
+        chunks = list(iter_mutations(gene_symbol, max_records))
+        if not chunks:
+            return hits_to_frame([])
+        return pd.concat(chunks, ignore_index=True)
+    except Exception as e:
+        metrics.error(type(e).__name__)
+        return f"Error fetching mutations: {e}"
+
+
+@cached_async("mutations")
+async def fetch_mutations_async(gene_symbol, max_records=MAX_VARIANTS):
+    """fetch_mutations without a thread per request; same DataFrame or error string."""
     try:
-        url = f"https://myvariant.info/v1/query?q={gene_symbol}&fields=dbsnp,cadd,snpeff,hgvs"
-        res = requests.get(url)
-        res.raise_for_status()
-        hits = res.json().get("hits", [])
-
-        mutations = []
-        for hit in hits:
-            # --- dbSNP rsID ---
-            dbsnp_data = hit.get("dbsnp", {})
-            rsid = dbsnp_data.get("rsid", "N/A")
-            if isinstance(rsid, list):
-                rsid = ", ".join(rsid)
-            elif not rsid:
-                rsid = "N/A"
-
-            # --- CADD score ---
-            cadd_data = hit.get("cadd", {})
-            cadd_score = cadd_data.get("phred", "N/A")
-            try:
-                cadd_score = float(cadd_score)
-            except:
-                cadd_score = "N/A"
-
-            # --- Mutation name (protein-level) ---
-            mutation_name = "N/A"
-
-            # 1. Check snpEff
-            snpeff_data = hit.get("snpeff", {})
-            if isinstance(snpeff_data, dict):
-                ann = snpeff_data.get("ann", [])
-                if isinstance(ann, list) and ann:
-                    for entry in ann:
-                        if isinstance(entry, dict) and "hgvs_p" in entry:
-                            mutation_name = entry["hgvs_p"]
-                            break
-
-            # 2. Fallback: HGVS strings
-            if mutation_name == "N/A":
-                hgvs_data = hit.get("hgvs", [])
-                if isinstance(hgvs_data, list):
-                    for item in hgvs_data:
-                        if isinstance(item, str) and "p." in item:
-                            mutation_name = item.split(":")[-1]
-                            break
-                elif isinstance(hgvs_data, str) and "p." in hgvs_data:
-                    mutation_name = hgvs_data.split(":")[-1]
-
-            # --- Risk level classification ---
-            risk_level = "N/A"
-            if isinstance(cadd_score, (int, float)):
-                if cadd_score >= 20:
-                    risk_level = "🔴 High"
-                elif cadd_score >= 10:
-                    risk_level = "🟡 Moderate"
-                else:
-                    risk_level = "🟢 Low"
-
-            # ✅ Make variant_id clickable (to MyVariant.info)
-            variant_id = hit.get("_id", "N/A")
-            if variant_id != "N/A":
-                variant_id = f'<a href="https://myvariant.info/v1/variant/{variant_id}" target="_blank">{variant_id}</a>'
-           
-            variant = {
-                "variant_id": variant_id,
-                "mutation_name": mutation_name,
-                "dbsnp": rsid,
-                "cadd_score": cadd_score,
-                "risk_level": risk_level
-            }
-            mutations.append(variant)
-
-        return mutations
+        chunks = []
+        async for hits in iter_variant_hits_async(gene_symbol, max_records):
+            with metrics.span("frame"):
+                chunks.append(hits_to_frame(hits))
+        if not chunks:
+            return hits_to_frame([])
+        return pd.concat(chunks, ignore_index=True)
     except Exception as e:
+        metrics.error(type(e).__name__)
         return f"Error fetching mutations: {e}"
@@ -0,0 +1,156 @@
+# 📁 utils/opentargets.py
+"""Batched Open Targets GraphQL: many genes per request via aliased fields.
+
+    search_targets(["TP53", "BRCA1", ...])   -> {symbol: ensembl_id}
+    fetch_targets(["ENSG...", ...])          -> {ensembl_id: {"diseases": rows, "drugs": rows}}
+
+Documents are packed up to MAX_ALIASES fields / MAX_QUERY_CHARS characters and
+split in half again if the server rejects one as too large.
+"""
+from utils import http_client, metrics
+from utils.drugs import DRUG_CANDIDATE_FIELDS
+from utils.ensembl import get_resolver
+
+API_URL = "https://api.platform.opentargets.org/api/v4/graphql"
+
+MAX_ALIASES = 25
+MAX_QUERY_CHARS = 40000
+DISEASE_PAGE_SIZE = 100
+
+SEARCH_FIELD = """
+  {alias}: search(queryString: ${alias}, entityNames: ["target"], page: {{index: 0, size: 1}}) {{
+    hits {{ object {{ ... on Target {{ id approvedSymbol }} }} }}
+  }}
+"""
+
+TARGET_FIELD = """
+  {alias}: target(ensemblId: ${alias}) {{
+    id
+    approvedSymbol
+    {fields}
+  }}
+"""
+
+DISEASE_FIELDS = """
+    associatedDiseases(page: {{index: 0, size: {size}}}) {{
+      count
+      rows {{
+        disease {{ name id }}
+        score
+      }}
+    }}
+"""
+
+
+class BatchRejected(Exception):
+    pass
+
+
+def build_document(field_template, values, **fmt):
+    """Build one aliased query document and its variables for a list of values."""
+    aliases = [f"q{i}" for i in range(len(values))]
+    params = ", ".join(f"${alias}: String!" for alias in aliases)
+    fields = "".join(field_template.format(alias=alias, **fmt) for alias in aliases)
+    return f"query batch({params}) {{{fields}}}", dict(zip(aliases, values))
+
+
+def pack(field_template, values, max_aliases=MAX_ALIASES, max_chars=MAX_QUERY_CHARS, **fmt):
+    """Split values into groups whose documents stay under the alias and size limits."""
+    groups, current = [], []
+    for value in values:
+        candidate = current + [value]
+        query, _ = build_document(field_template, candidate, **fmt)
+        if current and (len(candidate) > max_aliases or len(query) > max_chars):
+            groups.append(current)
+            current = [value]
+        else:
+            current = candidate
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _post(query, variables):
+    res = http_client.post(API_URL, json={"query": query, "variables": variables})
+    if res.status_code in (400, 413):
+        raise BatchRejected(res.text[:200])
+    res.raise_for_status()
+    with metrics.span("parse"):
+        data = res.json()
+    if not data.get("data"):
+        raise BatchRejected(str(data.get("errors"))[:200])
+    return data["data"]
+
+
+def run_batched(field_template, values, **fmt):
+    """Run every packed document and return {value: aliased result}.
+
+    A document the server refuses is split in half and retried, down to one value.
+    """
+    results = {}
+    pending = pack(field_template, values, **fmt)
+    while pending:
+        group = pending.pop()
+        query, variables = build_document(field_template, group, **fmt)
+        try:
+            data = _post(query, variables)
+        except BatchRejected:
+            if len(group) == 1:
+                raise
+            middle = len(group) // 2
+            pending.extend([group[:middle], group[middle:]])
+            continue
+        for alias, value in variables.items():
+            results[value] = data.get(alias)
+    return results
+
+
+def search_targets(symbols):
+    """Resolve many gene symbols to Ensembl IDs, only querying the ones not cached yet."""
+    resolver = get_resolver()
+    resolved, missing = {}, []
+    for symbol in symbols:
+        ensembl_id = resolver.cached(symbol)
+        if ensembl_id:
+            resolved[symbol] = ensembl_id
+        else:
+            missing.append(symbol)
+
+    if missing:
+        for symbol, found in run_batched(SEARCH_FIELD, missing).items():
+            hits = (found or {}).get("hits") or []
+            if hits:
+                resolved[symbol] = hits[0]["object"]["id"]
+                resolver.store(symbol, resolved[symbol])
+
+    return resolved
+
+
+def fetch_targets(ensembl_ids, diseases=True, drugs=True, disease_page_size=DISEASE_PAGE_SIZE):
+    """Fetch associatedDiseases and/or drugAndClinicalCandidates rows for many targets."""
+    fields = ""
+    if diseases:
+        fields += DISEASE_FIELDS.format(size=disease_page_size)
+    if drugs:
+        fields += DRUG_CANDIDATE_FIELDS
+
+    targets = {}
+    for ensembl_id, target in run_batched(TARGET_FIELD, list(ensembl_ids), fields=fields).items():
+        target = target or {}
+        associations = target.get("associatedDiseases") or {}
+        targets[ensembl_id] = {
+            "diseases": associations.get("rows", []),
+            "disease_count": associations.get("count", 0),
+            "drugs": (target.get("drugAndClinicalCandidates") or {}).get("rows", []),
+        }
+    return targets
+
+
+def fetch_targets_for_symbols(symbols, **kwargs):
+    """search_targets + fetch_targets: {symbol: {"ensembl_id", "diseases", "drugs"}}."""
+    ids = search_targets(symbols)
+    targets = fetch_targets(set(ids.values()), **kwargs)
+    return {
+        symbol: {"ensembl_id": ensembl_id, **targets.get(ensembl_id, {"diseases": [], "disease_count": 0, "drugs": []})}
+        for symbol, ensembl_id in ids.items()
+    }
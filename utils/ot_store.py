@@ -0,0 +1,254 @@
+# 📁 utils/ot_store.py
+"""Local Open Targets store built from a downloaded Parquet release.
+
+    python -m utils.ot_store ingest RELEASE_DIR --db ot.sqlite
+
+RELEASE_DIR holds the release's dataset folders (targets/, diseases/,
+association_overall_direct/ and knownDrugsAggregated/); each can also be
+given explicitly with --targets/--diseases/--associations/--drugs.
+Point G2T_OT_STORE at the resulting file and fetch_diseases /
+fetch_drugs_for_gene answer from it instead of the GraphQL API.
+"""
+import argparse
+import glob
+import math
+import os
+import sqlite3
+import threading
+
+# Folder names used by recent releases, first match wins
+DATASETS = {
+    "targets": ["targets", "target"],
+    "diseases": ["diseases", "disease"],
+    "associations": ["association_overall_direct", "associationByOverallDirect"],
+    "drugs": ["knownDrugsAggregated", "known_drug"],
+}
+
+# Parquet column → store column; alternatives cover schema renames between releases
+COLUMNS = {
+    "targets": {"id": ["id"], "symbol": ["approvedSymbol"]},
+    "diseases": {"id": ["id"], "name": ["name"]},
+    "associations": {"target_id": ["targetId"], "disease_id": ["diseaseId"], "score": ["score"]},
+    "drugs": {
+        "target_id": ["targetId"],
+        "drug_id": ["drugId"],
+        "drug_name": ["prefName", "drugName"],
+        "stage": ["phase", "maxClinicalStage", "maximumClinicalStage"],
+        "disease_id": ["diseaseId"],
+        "disease_name": ["label", "diseaseName"],
+    },
+}
+
+# knownDrugsAggregated gives a numeric phase; the GraphQL API a stage name
+PHASE_STAGES = {
+    4.0: "APPROVAL",
+    3.0: "PHASE_3",
+    2.0: "PHASE_2",
+    1.0: "PHASE_1",
+    0.5: "EARLY_PHASE_1",
+    0.0: "PRECLINICAL",
+}
+
+# Stage names from lowest to highest, for picking a drug's furthest stage
+STAGE_ORDER = [
+    "UNKNOWN", "PRECLINICAL", "EARLY_PHASE_1", "PHASE_1", "PHASE_1_2",
+    "PHASE_2", "PHASE_2_3", "PHASE_3", "PHASE_4", "APPROVAL",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS targets (id TEXT PRIMARY KEY, symbol TEXT);
+CREATE TABLE IF NOT EXISTS diseases (id TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE IF NOT EXISTS associations (target_id TEXT, disease_id TEXT, score REAL);
+CREATE TABLE IF NOT EXISTS drugs (
+    target_id TEXT, drug_id TEXT, drug_name TEXT, stage TEXT, disease_id TEXT, disease_name TEXT
+);
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS targets_symbol ON targets (symbol COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS associations_target ON associations (target_id, score DESC);
+CREATE INDEX IF NOT EXISTS drugs_target ON drugs (target_id);
+"""
+
+BATCH_ROWS = 100_000
+
+
+# ---------------------------------------------------
+# Ingestion
+# ---------------------------------------------------
+
+def find_dataset(release_dir, name):
+    for folder in DATASETS[name]:
+        path = os.path.join(release_dir, folder)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def iter_parquet_batches(path, wanted):
+    """Yield DataFrames of the wanted columns from a Parquet file or folder, batch by batch."""
+    import pyarrow.parquet as pq
+
+    files = sorted(glob.glob(os.path.join(path, "**", "*.parquet"), recursive=True)) \
+        if os.path.isdir(path) else [path]
+
+    for file in files:
+        parquet = pq.ParquetFile(file)
+        available = set(parquet.schema_arrow.names)
+        rename = {}
+        for column, candidates in wanted.items():
+            source = next((c for c in candidates if c in available), None)
+            if source is None:
+                raise ValueError(f"{file}: none of {candidates} found for column '{column}'")
+            rename[source] = column
+
+        for batch in parquet.iter_batches(columns=list(rename), batch_size=BATCH_ROWS):
+            yield batch.to_pandas().rename(columns=rename)[list(wanted)]
+
+
+def ingest(db_path, targets=None, diseases=None, associations=None, drugs=None, log=print):
+    """Load the given Parquet datasets into db_path, replacing what was there."""
+    db = sqlite3.connect(db_path)
+    db.executescript(SCHEMA)
+
+    for table, path in (
+        ("targets", targets), ("diseases", diseases),
+        ("associations", associations), ("drugs", drugs),
+    ):
+        if not path:
+            continue
+        db.execute(f"DELETE FROM {table}")
+        columns = list(COLUMNS[table])
+        insert = f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        count = 0
+        for df in iter_parquet_batches(path, COLUMNS[table]):
+            if "stage" in df:
+                stages = df["stage"].map(phase_to_stage).astype(object)
+                df["stage"] = stages.where(stages.notna(), None)  # NULL, not "nan"
+            db.executemany(insert, df.itertuples(index=False, name=None))
+            count += len(df)
+        db.commit()
+        log(f"{table}: {count} rows")
+
+    db.executescript(INDEXES)
+    db.commit()
+    db.close()
+
+
+# ---------------------------------------------------
+# Queries
+# ---------------------------------------------------
+
+class OpenTargetsStore:
+    """Read-only access returning rows in the same shape as the GraphQL API."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _db(self):
+        # sqlite3 connections are per thread; the lookup pool queries from several
+        if not hasattr(self._local, "db"):
+            self._local.db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        return self._local.db
+
+    def ensembl_id(self, gene_symbol):
+        row = self._db().execute(
+            "SELECT id FROM targets WHERE symbol = ? COLLATE NOCASE", (gene_symbol.strip(),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def disease_rows(self, ensembl_id, min_score=None, top_k=None):
+        """associatedDiseases-style rows, best score first."""
+        sql = (
+            "SELECT a.disease_id, COALESCE(d.name, a.disease_id), a.score FROM associations a "
+            "LEFT JOIN diseases d ON d.id = a.disease_id WHERE a.target_id = ?"
+        )
+        params = [ensembl_id]
+        if min_score is not None:
+            sql += " AND a.score >= ?"
+            params.append(min_score)
+        sql += " ORDER BY a.score DESC"
+        if top_k is not None:
+            sql += " LIMIT ?"
+            params.append(top_k)
+        return [
+            {"disease": {"id": disease_id, "name": name}, "score": score}
+            for disease_id, name, score in self._db().execute(sql, params)
+        ]
+
+    def drug_rows(self, ensembl_id):
+        """drugAndClinicalCandidates-style rows, one per drug with all its diseases."""
+        drugs = {}
+        for drug_id, drug_name, stage, disease_id, disease_name in self._db().execute(
+            "SELECT drug_id, drug_name, stage, disease_id, disease_name FROM drugs WHERE target_id = ?",
+            (ensembl_id,)
+        ):
+            row = drugs.setdefault(drug_id, {
+                "id": drug_id,
+                "maxClinicalStage": stage,
+                "drug": {"id": drug_id, "name": drug_name, "maximumClinicalStage": stage},
+                "diseases": [],
+            })
+            if _stage_rank(stage) > _stage_rank(row["maxClinicalStage"]):
+                row["maxClinicalStage"] = row["drug"]["maximumClinicalStage"] = stage
+            if disease_id and all(d["disease"]["id"] != disease_id for d in row["diseases"]):
+                row["diseases"].append({"disease": {"id": disease_id, "name": disease_name}})
+        return list(drugs.values())
+
+
+def phase_to_stage(phase):
+    """The API's stage name for a release's phase value; None when the phase is missing.
+
+    Newer releases already store the stage name, which is kept as is.
+    """
+    if phase is None or (isinstance(phase, float) and math.isnan(phase)):
+        return None
+    if isinstance(phase, str):
+        return phase or None
+    return PHASE_STAGES.get(float(phase))
+
+
+def _stage_rank(stage):
+    return STAGE_ORDER.index(stage) if stage in STAGE_ORDER else -1
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_ot_store():
+    """The store configured by G2T_OT_STORE, or None when running against the live API."""
+    global _store
+    path = os.getenv("G2T_OT_STORE")
+    if not path or not os.path.exists(path):
+        return None
+    with _store_lock:
+        if _store is None or _store.path != path:
+            _store = OpenTargetsStore(path)
+        return _store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a local Open Targets store from a Parquet release.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cmd = sub.add_parser("ingest", help="load a downloaded release")
+    cmd.add_argument("release_dir", nargs="?", help="release folder containing the dataset folders")
+    cmd.add_argument("--db", default="ot_store.sqlite", help="SQLite file to create")
+    for name in DATASETS:
+        cmd.add_argument(f"--{name}", help=f"path of the {name} dataset (overrides release_dir)")
+    args = parser.parse_args(argv)
+
+    paths = {
+        name: getattr(args, name) or (find_dataset(args.release_dir, name) if args.release_dir else None)
+        for name in DATASETS
+    }
+    if not any(paths.values()):
+        parser.error("no datasets found; pass release_dir or --targets/--diseases/--associations/--drugs")
+
+    ingest(args.db, **paths)
+    print(f"Done. Set G2T_OT_STORE={os.path.abspath(args.db)} to use it.")
+
+
+if __name__ == "__main__":
+    main()
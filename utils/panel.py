@@ -0,0 +1,285 @@
+# 📁 utils/panel.py
+"""Run the whole gene → trials pipeline for a gene panel.
+
+    python -m utils.panel genes.txt --out results/
+"""
+import argparse
+import asyncio
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from utils.records import to_frame
+from utils.diseases import fetch_disease_page, format_disease_rows
+from utils.drugs import fetch_opentarget_drugs_async, format_drug_rows
+from utils import async_http
+from utils.lookup import ASYNC_SOURCES, SOURCES
+from utils.opentargets import DISEASE_PAGE_SIZE, fetch_targets_for_symbols
+from utils.ot_store import get_ot_store
+
+# Served from batched Open Targets documents instead of one fetch per gene
+OPENTARGETS_SOURCES = {"diseases", "drugs"}
+
+# Total in-flight fetches; http_client still caps each upstream host separately.
+MAX_WORKERS = 16
+
+# Extra associatedDiseases pages, fetched from inside the panel's Open Targets task.
+# A pool of their own: waiting on the panel pool from one of its tasks could deadlock,
+# and pages would queue behind every other fetch. Sized to Open Targets' connection cap.
+DISEASE_PAGE_WORKERS = 8
+_page_pool = ThreadPoolExecutor(max_workers=DISEASE_PAGE_WORKERS, thread_name_prefix="panel-disease-pages")
+
+# Fetches run_panel_async keeps going at once; each is a coroutine, not a thread.
+MAX_CONCURRENT_FETCHES = 1000
+
+# run_panel_async fetchers: the raw drug candidates, as the batched documents give run_panel,
+# not the tab's table with its "No Drug Found" placeholder row
+PANEL_ASYNC_SOURCES = {**ASYNC_SOURCES, "drugs": fetch_opentarget_drugs_async}
+
+
+def read_gene_list(path):
+    """Read gene symbols from a file: one per line or comma/whitespace separated, '#' comments."""
+    genes = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0]
+            genes.extend(line.replace(",", " ").split())
+    return genes
+
+
+def normalize_genes(genes):
+    """Upper-case and de-duplicate symbols, keeping the input order."""
+    seen = {}
+    for gene in genes:
+        symbol = gene.strip().upper()
+        if symbol:
+            seen.setdefault(symbol, None)
+    return list(seen)
+
+
+def _to_frame(result):
+    """Turn a fetcher result into a DataFrame, or return the error message it carries."""
+    if isinstance(result, str):
+        return result
+    if isinstance(result, pd.DataFrame):
+        return result.copy()
+    if result and result[0].get("title") == "Error":
+        return result[0]["abstract"]
+    return to_frame(result)
+
+
+def run_panel(genes, sources=None, max_workers=MAX_WORKERS, progress=None):
+    """Fetch every source for every gene and return {source: DataFrame} plus an "errors" table.
+
+    Each table gets a leading "gene" column so the whole panel fits in one frame.
+    `progress(done, total)` is called after each fetch finishes.
+    """
+    genes = normalize_genes(genes)
+    sources = sources or list(SOURCES)
+    tables = {source: [] for source in sources}
+    errors = []
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="panel") as pool:
+        futures = {
+            pool.submit(SOURCES[source], gene): (gene, source)
+            for gene in genes
+            for source in sources
+            if source not in OPENTARGETS_SOURCES
+        }
+
+        # Open Targets: a handful of aliased documents for the whole panel
+        ot_sources = [source for source in sources if source in OPENTARGETS_SOURCES]
+        if ot_sources:
+            ot_future = pool.submit(_fetch_opentargets, genes, ot_sources)
+            futures[ot_future] = (None, "opentargets")
+
+        for done, future in enumerate(as_completed(futures), 1):
+            gene, source = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = str(e)
+
+            if source == "opentargets":
+                if isinstance(result, str):
+                    errors.extend({"gene": g, "source": s, "error": result} for g in genes for s in ot_sources)
+                else:
+                    for (ot_gene, ot_source), ot_result in result.items():
+                        _collect(tables, errors, ot_gene, ot_source, ot_result)
+            else:
+                _collect(tables, errors, gene, source, result)
+
+            if progress:
+                progress(done, len(futures))
+
+    return _results(tables, errors)
+
+
+async def run_panel_async(genes, sources=None, max_concurrency=MAX_CONCURRENT_FETCHES, progress=None):
+    """run_panel on one event loop: every (gene, source) fetch is a coroutine.
+
+    Uses the per-gene async fetchers rather than batched Open Targets documents;
+    the shared per-host limits in utils.async_http keep the upstreams in check.
+    """
+    genes = normalize_genes(genes)
+    sources = sources or list(PANEL_ASYNC_SOURCES)
+    tables = {source: [] for source in sources}
+    errors = []
+    slots = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(gene, source):
+        async with slots:
+            try:
+                return gene, source, await PANEL_ASYNC_SOURCES[source](gene)
+            except Exception as e:
+                return gene, source, str(e)
+
+    pending = [fetch(gene, source) for gene in genes for source in sources]
+    try:
+        for done, finished in enumerate(asyncio.as_completed(pending), 1):
+            gene, source, result = await finished
+            _collect(tables, errors, gene, source, result)
+            if progress:
+                progress(done, len(pending))
+    finally:
+        await async_http.aclose()
+
+    return _results(tables, errors)
+
+
+def _results(tables, errors):
+    results = {
+        source: pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["gene"])
+        for source, frames in tables.items()
+    }
+    results["errors"] = pd.DataFrame(errors, columns=["gene", "source", "error"])
+    return results
+
+
+def _collect(tables, errors, gene, source, result):
+    frame = _to_frame(result)
+    if isinstance(frame, str):
+        errors.append({"gene": gene, "source": source, "error": frame})
+    elif not frame.empty:
+        frame.insert(0, "gene", gene)
+        tables[source].append(frame)
+
+
+def _fetch_opentargets(genes, sources):
+    """Diseases and drug candidates for the whole panel as {(gene, source): result}.
+
+    With a local Open Targets release (G2T_OT_STORE) every symbol it knows is
+    answered from there; only the rest go to the GraphQL API.
+    """
+    results = {}
+    store = get_ot_store()
+    if store:
+        remaining = []
+        for gene in genes:
+            ensembl_id = store.ensembl_id(gene)
+            if ensembl_id is None:
+                remaining.append(gene)
+                continue
+            if "diseases" in sources:
+                results[gene, "diseases"] = format_disease_rows(store.disease_rows(ensembl_id))
+            if "drugs" in sources:
+                results[gene, "drugs"] = format_drug_rows(store.drug_rows(ensembl_id))
+        genes = remaining
+        if not genes:
+            return results
+
+    targets = fetch_targets_for_symbols(
+        genes, diseases="diseases" in sources, drugs="drugs" in sources
+    )
+    more_rows = _remaining_disease_rows(targets.values()) if "diseases" in sources else {}
+    for gene in genes:
+        target = targets.get(gene)
+        for source in sources:
+            if target is None:
+                results[gene, source] = f"No Ensembl ID found for gene symbol: {gene}"
+            elif source == "diseases":
+                rows = more_rows.get(target["ensembl_id"], [])
+                results[gene, source] = rows if isinstance(rows, str) else format_disease_rows(target["diseases"] + rows)
+            else:
+                results[gene, source] = format_drug_rows(target["drugs"])
+    return results
+
+
+def _remaining_disease_rows(targets):
+    """The batched documents only carry each target's first page; fetch every other page
+    of every target at once on their own pool.
+
+    Returns {ensembl_id: rows after the first page}, or an error message for targets
+    where a page failed.
+    """
+    pages = {}
+    for target in targets:
+        if target is None:
+            continue
+        for index in range(1, math.ceil(target["disease_count"] / DISEASE_PAGE_SIZE)):
+            pages[target["ensembl_id"], index] = _page_pool.submit(
+                fetch_disease_page, target["ensembl_id"], index, DISEASE_PAGE_SIZE
+            )
+
+    # Pages were submitted in index order, so rows come out in score order
+    rows = {}
+    for (ensembl_id, _), page in pages.items():
+        if isinstance(rows.get(ensembl_id), str):
+            continue  # an earlier page already failed
+        try:
+            _, page_rows = page.result()
+        except Exception as e:
+            rows[ensembl_id] = f"Error fetching diseases: {e}"
+            continue
+        rows.setdefault(ensembl_id, []).extend(page_rows)
+    return rows
+
+
+def write_panel(results, out_dir):
+    """Write one CSV per table into out_dir and return the written paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for name, df in results.items():
+        path = os.path.join(out_dir, f"{name}.csv")
+        df.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Gene2Trials for a whole gene panel.")
+    parser.add_argument("gene_file", help="file with gene symbols (one per line or comma separated)")
+    parser.add_argument("-o", "--out", default="panel_results", help="output directory for the CSV tables")
+    parser.add_argument(
+        "-s", "--sources", nargs="+", choices=list(SOURCES),
+        help="only fetch these sources (default: all)"
+    )
+    parser.add_argument("-w", "--workers", type=int, help="concurrent fetches (threads, or coroutines with --async)")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="run every fetch on one event loop")
+    args = parser.parse_args(argv)
+
+    genes = normalize_genes(read_gene_list(args.gene_file))
+    print(f"Running {len(genes)} genes")
+
+    def progress(done, total):
+        print(f"\r{done}/{total} fetches", end="", flush=True)
+
+    if args.use_async:
+        results = asyncio.run(run_panel_async(
+            genes, sources=args.sources, max_concurrency=args.workers or MAX_CONCURRENT_FETCHES, progress=progress
+        ))
+    else:
+        results = run_panel(genes, sources=args.sources, max_workers=args.workers or MAX_WORKERS, progress=progress)
+    print()
+
+    for path in write_panel(results, args.out):
+        print("Wrote", path)
+
+    if not results["errors"].empty:
+        print(f"{len(results['errors'])} fetches failed, see errors.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# 📁 utils/records.py
+"""Compact record types shared by the fetchers.
+
+Each record is a __slots__ object: no per-instance __dict__, so a panel-sized
+result set costs a fraction of the equivalent list of dicts. Records still
+support record["field"] and .get() so code written against the old dicts
+keeps working, and to_frame() builds a DataFrame column by column.
+Mutations skip the record stage entirely: utils.mutations parses straight
+into columnar DataFrames.
+"""
+import pandas as pd
+
+
+class Record:
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        for field, value in zip(self.__slots__, args):
+            setattr(self, field, value)
+        for field, value in kwargs.items():
+            setattr(self, field, value)
+        for field in self.__slots__[len(args):]:
+            if field not in kwargs:
+                setattr(self, field, None)
+
+    def __getitem__(self, field):
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field) from None
+
+    def get(self, field, default=None):
+        return getattr(self, field, default)
+
+    def keys(self):
+        return self.__slots__
+
+    def values(self):
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def as_dict(self):
+        return dict(zip(self.__slots__, self.values()))
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.values() == other.values()
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in self.as_dict().items())
+        return f"{type(self).__name__}({fields})"
+
+    # __slots__ classes pickle via __getstate__/__setstate__ (used by the disk caches)
+    def __getstate__(self):
+        return self.values()
+
+    def __setstate__(self, state):
+        for field, value in zip(self.__slots__, state):
+            setattr(self, field, value)
+
+
+class Disease(Record):
+    __slots__ = ("disease", "id", "score")
+
+
+class Trial(Record):
+    __slots__ = ("nct_id", "title", "condition", "sponsor", "overall_status", "interventions")
+
+
+class Paper(Record):
+    __slots__ = ("title", "abstract")
+
+
+def to_frame(records, record_type=None):
+    """DataFrame from a list of records (or dicts, or an existing DataFrame).
+
+    Records are transposed straight into one list per column, so pandas never
+    has to inspect per-row mappings.
+    """
+    if isinstance(records, pd.DataFrame):
+        return records
+    records = list(records)
+    if not records:
+        return pd.DataFrame(columns=list(record_type.__slots__) if record_type else None)
+    if not isinstance(records[0], Record):
+        return pd.DataFrame(records)
+    fields = type(records[0]).__slots__
+    columns = zip(*(record.values() for record in records))
+    return pd.DataFrame(dict(zip(fields, map(list, columns))), columns=list(fields))
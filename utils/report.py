@@ -0,0 +1,144 @@
+# 📁 utils/report.py
+"""Link the per-source tables of one gene into ranked disease → trial and drug → trial lists.
+
+Disease names from fetch_diseases, the Disease column of the drug table and
+trial conditions are normalized to one key, exploded to one row per
+(entity, key) and joined with pandas hash merges, so cost grows with the
+number of rows rather than rows × rows.
+"""
+import re
+
+import pandas as pd
+
+from utils.records import Disease, Trial, to_frame
+
+# Trials that can still enroll patients rank above finished ones
+STATUS_WEIGHT = {
+    "RECRUITING": 1.0,
+    "NOT_YET_RECRUITING": 0.9,
+    "ENROLLING_BY_INVITATION": 0.8,
+    "ACTIVE_NOT_RECRUITING": 0.7,
+    "COMPLETED": 0.5,
+}
+DEFAULT_STATUS_WEIGHT = 0.3
+
+# An intervention naming the drug counts more than sharing a disease
+INTERVENTION_MATCH = 2.0
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+_MARKDOWN_ID = re.compile(r"^\[([^\]]+)\]")
+
+
+def normalize_name(name):
+    """Case/punctuation-insensitive key: 'Breast Cancer' and 'breast-cancers' both become 'breast cancer'."""
+    words = _NON_WORD.sub(" ", str(name).lower()).split()
+    return " ".join(w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in words)
+
+
+def _split_names(series):
+    """Explode a column of ', '-joined names into one normalized key per row."""
+    keys = series.fillna("").astype(str).str.split(", ").explode()
+    keys = keys.map(normalize_name)
+    return keys[keys != ""]
+
+
+def _status_weight(status):
+    return status.fillna("").str.upper().map(STATUS_WEIGHT).fillna(DEFAULT_STATUS_WEIGHT)
+
+
+def disease_table(diseases):
+    """fetch_diseases output → disease, disease_id, association_score, key."""
+    df = to_frame(diseases, Disease)
+    if df.empty:
+        return pd.DataFrame(columns=["disease", "disease_id", "association_score", "key"])
+    return pd.DataFrame({
+        "disease": df["disease"],
+        "disease_id": df["id"].astype(str).str.extract(_MARKDOWN_ID, expand=False).fillna(df["id"]),
+        "association_score": df["score"].astype(float),
+        "key": df["disease"].map(normalize_name),
+    }).drop_duplicates("key")
+
+
+def trial_table(trials):
+    """fetch_clinical_trials output → one row per (trial, normalized condition)."""
+    df = to_frame(trials, Trial)
+    if df.empty:
+        return pd.DataFrame(columns=["nct_id", "title", "overall_status", "interventions", "key"])
+    if "interventions" not in df:
+        df["interventions"] = ""
+    keys = _split_names(df["condition"]).rename("key")
+    return df[["nct_id", "title", "overall_status", "interventions"]].join(keys, how="inner")
+
+
+def drug_table(drugs):
+    """fetch_drugs_for_gene output → one row per (drug, normalized disease)."""
+    df = to_frame(drugs)
+    if df.empty or "Drug" not in df:
+        return pd.DataFrame(columns=["drug", "chembl_id", "stage", "key"])
+    df = df[df["ChEMBL_ID"].fillna("-") != "-"]
+    out = pd.DataFrame({
+        "drug": df["Drug"],
+        "chembl_id": df["ChEMBL_ID"],
+        "stage": df["Clinical Stage"],
+    })
+    return out.join(_split_names(df["Disease"]).rename("key"), how="inner")
+
+
+def link_diseases_to_trials(diseases, trials):
+    """Trials whose conditions match an associated disease, best association and status first."""
+    d = disease_table(diseases)
+    t = trial_table(trials)
+    links = d.merge(t, on="key", how="inner")
+    if links.empty:
+        return pd.DataFrame(columns=[
+            "disease", "disease_id", "association_score", "nct_id", "title", "overall_status", "rank_score"])
+    links["rank_score"] = links["association_score"] * _status_weight(links["overall_status"])
+    return (
+        links.drop(columns=["key", "interventions"])
+        .sort_values(["rank_score", "association_score"], ascending=False)
+        .reset_index(drop=True)
+    )
+
+
+def link_drugs_to_trials(drugs, trials, diseases=None):
+    """Trials that test a drug (intervention names it) or target one of its diseases, ranked."""
+    dr = drug_table(drugs)
+    tr = trial_table(trials)
+    columns = ["drug", "chembl_id", "stage", "nct_id", "title", "overall_status", "match", "rank_score"]
+    if dr.empty or tr.empty:
+        return pd.DataFrame(columns=columns)
+
+    # 1. Intervention matches: index trials by every normalized intervention name
+    interventions = tr.drop_duplicates("nct_id")
+    by_intervention = interventions[["nct_id", "title", "overall_status"]].join(
+        _split_names(interventions["interventions"]).rename("drug_key"), how="inner"
+    )
+    drugs_by_name = dr.drop_duplicates("drug").assign(drug_key=lambda x: x["drug"].map(normalize_name))
+    tested = drugs_by_name[["drug", "chembl_id", "stage", "drug_key"]].merge(by_intervention, on="drug_key")
+    tested = tested.drop(columns="drug_key").assign(match="intervention", weight=INTERVENTION_MATCH)
+
+    # 2. Shared-disease matches, weighted by the gene's association with that disease
+    shared = dr.merge(tr[["nct_id", "title", "overall_status", "key"]], on="key")
+    weights = disease_table(diseases or []).set_index("key")["association_score"]
+    shared["weight"] = shared["key"].map(weights).fillna(0.1)
+    shared["match"] = "disease: " + shared["key"]
+    shared = shared.drop(columns="key")
+
+    links = pd.concat([tested, shared], ignore_index=True)
+    links["rank_score"] = links["weight"] * _status_weight(links["overall_status"])
+    return (
+        links.sort_values("rank_score", ascending=False)
+        .drop_duplicates(["drug", "nct_id"])
+        .reset_index(drop=True)[columns]
+    )
+
+
+def build_gene_report(diseases, drugs, trials):
+    """Both link tables for one gene; inputs are the fetchers' outputs (error strings count as empty)."""
+    diseases = diseases if isinstance(diseases, list) else []
+    trials = trials if isinstance(trials, list) else []
+    drugs = drugs if isinstance(drugs, (list, pd.DataFrame)) else []
+    return {
+        "disease_trials": link_diseases_to_trials(diseases, trials),
+        "drug_trials": link_drugs_to_trials(drugs, trials, diseases),
+    }
@@ -0,0 +1,14 @@
+# 📁 utils/settings.py
+import os
+
+# Everything persisted between runs (ID cache, response cache, ...) lives here.
+CACHE_DIR = os.getenv(
+    "G2T_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "gene2trials")
+)
+
+
+def cache_path(filename):
+    """Return a path inside CACHE_DIR, creating the directory on first use."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, filename)
@@ -1,5 +1,11 @@
+import asyncio
+import io
 import os
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils import async_http, http_client, metrics
+from utils.records import Paper
+from utils.cache import cached, cached_async, cached_generation, generation_key, get_summary_store
 import xml.etree.ElementTree as ET
 from groq import Groq
 
@@ -16,115 +22,303 @@ PUBMED_FETCH = (
 # Fetch PubMed papers
 # ---------------------------------------------------
 
-def fetch_pubmed_abstracts(gene_symbol, max_results=15):
+def parse_article(article):
 
-    try:
+    title = article.findtext(".//ArticleTitle") or ""
 
-        search = requests.get(
-            PUBMED_SEARCH,
-            params={
-                "db": "pubmed",
-                "term": gene_symbol,
-                "retmode": "json",
-                "retmax": max_results,
-                "sort": "pub_date"
-            },
-            timeout=30
+    abstract = ""
+
+    nodes = article.findall(".//AbstractText")
+
+    if nodes:
+
+        abstract = " ".join(
+            [
+                n.text.strip()
+                for n in nodes
+                if n.text
+            ]
+        )
+
+    if len(abstract) > 20:
+
+        return Paper(
+            title=title,
+            abstract=abstract
         )
 
-        ids = search.json()["esearchresult"]["idlist"]
+    return None
+
+
+def iter_pubmed_articles(stream):
+
+    # Incremental parse of an efetch XML stream: one paper at a time,
+    # each <PubmedArticle> is dropped from the tree once it is parsed,
+    # so memory stays flat however many records come back
+
+    root = None
+
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+
+        if root is None:
+            root = elem
+
+        if event == "end" and elem.tag == "PubmedArticle":
+
+            paper = parse_article(elem)
+
+            elem.clear()
+            root.clear()
+
+            if paper:
+                yield paper
+
+
+def eutils_params(params):
+
+    # Identify with NCBI_API_KEY when set; it raises our limit from 3 to 10 requests/s
+
+    api_key = os.getenv("NCBI_API_KEY")
+
+    if api_key:
+        params = dict(params, api_key=api_key.strip())
+
+    return params
+
+
+def efetch_params(params):
+
+    return eutils_params(
+        dict(params, db="pubmed", retmode="xml")
+    )
+
+
+def iter_efetch(params):
+
+    # Stream the efetch body straight into the parser instead of reading xml.text
+
+    response = http_client.get(
+        PUBMED_FETCH,
+        params=efetch_params(params),
+        stream=True
+    )
+
+    with response:
+
+        response.raise_for_status()
+        response.raw.decode_content = True
+
+        # The body is read while it is parsed, so this span covers both
+
+        with metrics.span("parse", streamed=True):
+            yield from iter_pubmed_articles(response.raw)
 
-        if len(ids) == 0:
-            return []
 
-        xml = requests.get(
-            PUBMED_FETCH,
-            params={
-                "db": "pubmed",
-                "id": ",".join(ids),
-                "retmode": "xml"
-            },
-            timeout=60
+def search_pubmed_history(gene_symbol):
+
+    # esearch with usehistory=y parks the result set on NCBI's history server;
+    # efetch then pages through it by WebEnv/query_key instead of long ID lists
+
+    return parse_pubmed_search(
+        http_client.get(
+            PUBMED_SEARCH,
+            params=pubmed_search_params(gene_symbol)
         )
+    )
 
-        root = ET.fromstring(xml.text)
 
-        papers = []
+def pubmed_search_params(gene_symbol):
 
-        for article in root.findall(".//PubmedArticle"):
+    return eutils_params({
+        "db": "pubmed",
+        "term": gene_symbol,
+        "retmode": "json",
+        "retmax": 0,
+        "sort": "pub_date",
+        "usehistory": "y"
+    })
 
-            title = article.findtext(".//ArticleTitle") or ""
 
-            abstract = ""
+def parse_pubmed_search(search):
 
-            nodes = article.findall(".//AbstractText")
+    search.raise_for_status()
 
-            if nodes:
+    with metrics.span("parse"):
+        result = search.json()["esearchresult"]
 
-                abstract = " ".join(
-                    [
-                        n.text.strip()
-                        for n in nodes
-                        if n.text
-                    ]
-                )
+    return (
+        int(result.get("count", 0)),
+        result.get("webenv"),
+        result.get("querykey")
+    )
+
+
+EFETCH_BATCH = 200
+MAX_PARALLEL_BATCHES = 3
+
+_efetch_pool = ThreadPoolExecutor(
+    max_workers=MAX_PARALLEL_BATCHES,
+    thread_name_prefix="efetch"
+)
+
+
+def _fetch_batch(webenv, query_key, retstart, retmax):
+
+    return list(
+        iter_efetch({
+            "WebEnv": webenv,
+            "query_key": query_key,
+            "retstart": retstart,
+            "retmax": retmax
+        })
+    )
+
+
+def iter_pubmed_abstracts(gene_symbol, max_results=15, batch_size=EFETCH_BATCH):
+
+    # Papers stream out batch by batch, newest first. Up to MAX_PARALLEL_BATCHES
+    # efetch calls run at once; http_client's NCBI token bucket keeps them
+    # inside the per-second limit
+
+    count, webenv, query_key = search_pubmed_history(gene_symbol)
+
+    total = min(count, max_results)
+
+    starts = iter(range(0, total, batch_size))
+
+    in_flight = []
 
-            if len(abstract) > 20:
+    def submit_next():
 
-                papers.append(
-                    {
-                        "title": title,
-                        "abstract": abstract
-                    }
+        start = next(starts, None)
+
+        if start is not None:
+
+            in_flight.append(
+                _efetch_pool.submit(
+                    metrics.propagate(_fetch_batch),
+                    webenv,
+                    query_key,
+                    start,
+                    min(batch_size, total - start)
                 )
+            )
+
+    for _ in range(MAX_PARALLEL_BATCHES):
+        submit_next()
+
+    while in_flight:
+
+        batch = in_flight.pop(0).result()
+
+        submit_next()
+
+        yield from batch
+
+
+def _is_paper_list(papers):
+    # Failures come back as a single "Error" paper; never cache those
+    return not (papers and papers[0].get("title") == "Error")
 
-        return papers
+
+@cached("literature", store_if=_is_paper_list)
+def fetch_pubmed_abstracts(gene_symbol, max_results=15):
+
+    try:
+
+        return list(
+            iter_pubmed_abstracts(gene_symbol, max_results)
+        )
 
     except Exception as e:
 
-        return [{
-            "title": "Error",
-            "abstract": str(e)
-        }]
+        return _error_papers(e)
 
 
-# ---------------------------------------------------
-# Groq Literature Review
-# ---------------------------------------------------
+def _error_papers(e):
 
-def generate_literature_review(gene_symbol):
+    metrics.error(type(e).__name__)
 
-    papers = fetch_pubmed_abstracts(gene_symbol)
+    return [Paper(
+        title="Error",
+        abstract=str(e)
+    )]
 
-    if len(papers) == 0:
-        return "No PubMed papers found."
 
-    literature = ""
+async def _fetch_batch_async(webenv, query_key, retstart, retmax):
 
-    for i, paper in enumerate(papers):
+    response = await async_http.get(
+        PUBMED_FETCH,
+        params=efetch_params({
+            "WebEnv": webenv,
+            "query_key": query_key,
+            "retstart": retstart,
+            "retmax": retmax
+        })
+    )
 
-        literature += f"""
-Paper {i+1}
-Title:
-{paper['title']}
-Abstract:
-{paper['abstract']}
-------------------------------------
-"""
+    response.raise_for_status()
 
-    # avoid token overflow
-    literature = literature[:22000]
+    with metrics.span("parse"):
+        return list(iter_pubmed_articles(io.BytesIO(response.content)))
 
-    api_key = os.getenv("GROQ_API_KEY")
 
-    if not api_key:
-        return "❌ GROQ_API_KEY not found."
+async def pubmed_abstracts_async(gene_symbol, max_results=15, batch_size=EFETCH_BATCH):
+
+    # Same esearch → efetch walk as iter_pubmed_abstracts, with every batch
+    # requested at once; the shared NCBI token bucket still paces them
+
+    count, webenv, query_key = parse_pubmed_search(
+        await async_http.get(
+            PUBMED_SEARCH,
+            params=pubmed_search_params(gene_symbol)
+        )
+    )
+
+    total = min(count, max_results)
+
+    batches = await asyncio.gather(*(
+        _fetch_batch_async(webenv, query_key, start, min(batch_size, total - start))
+        for start in range(0, total, batch_size)
+    ))
 
-    api_key = api_key.strip()
+    return [paper for batch in batches for paper in batch]
 
-    client = Groq(api_key=api_key)
 
-    prompt = f"""
+@cached_async("literature", store_if=_is_paper_list)
+async def fetch_pubmed_abstracts_async(gene_symbol, max_results=15):
+
+    try:
+
+        return await pubmed_abstracts_async(gene_symbol, max_results)
+
+    except Exception as e:
+
+        return _error_papers(e)
+
+
+# ---------------------------------------------------
+# Groq Literature Review
+# ---------------------------------------------------
+
+REVIEW_MODEL = "llama-3.3-70b-versatile"
+REVIEW_TEMPERATURE = 0.2
+REVIEW_MAX_TOKENS = 1800
+
+# Bump whenever REVIEW_PROMPT / CHUNK_PROMPT / MERGE_PROMPT change, so cached outputs are not reused
+PROMPT_VERSION = "1"
+CHUNK_SUMMARY_TOKENS = 700
+
+# Prompt budget per call. The old literature[:22000] cut was about 5.5k tokens.
+CHUNK_TOKEN_BUDGET = 5500
+
+# Rough size of a Llama token in English/biomedical text; close enough to
+# budget prompts without shipping the model's tokenizer.
+CHARS_PER_TOKEN = 4
+
+MAX_PARALLEL_CALLS = 4
+
+REVIEW_PROMPT = """
 You are an expert biomedical scientist.
 Read all PubMed abstracts about the gene {gene_symbol}.
 Write a comprehensive literature review.
@@ -145,11 +339,133 @@ PubMed Papers:
 {literature}
 """
 
-    try:
+CHUNK_PROMPT = """
+You are an expert biomedical scientist.
+Below is one batch of PubMed abstracts about the gene {gene_symbol}.
+Summarize the key findings, methods and conclusions of these papers as concise bullet points.
+Keep concrete results (genes, variants, diseases, drugs, effect sizes).
+Do NOT invent facts.
+Use only the supplied papers.
+PubMed Papers:
+{literature}
+"""
+
+MERGE_PROMPT = """
+You are an expert biomedical scientist.
+Below are summaries of batches of PubMed abstracts about the gene {gene_symbol}.
+Together they cover every paper retrieved.
+Write a comprehensive literature review.
+The review should contain:
+# Overall Research Summary
+Write 2-3 detailed paragraphs.
+# Current Research Trends
+Bullet points.
+# Major Discoveries
+Bullet points.
+# Research Gaps
+Bullet points.
+# Future Directions
+Bullet points.
+Do NOT invent facts.
+Use only the supplied summaries.
+Batch Summaries:
+{literature}
+"""
+
+
+def count_tokens(text):
+
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text, budget):
+
+    # Cut at the last sentence end that fits instead of mid-word
+
+    limit = budget * CHARS_PER_TOKEN
+
+    if len(text) <= limit:
+        return text
+
+    cut = text.rfind(". ", 0, limit)
+
+    return text[:cut + 1] if cut > 0 else text[:limit]
+
+
+def format_paper(i, paper):
+
+    return f"""
+Paper {i+1}
+Title:
+{paper['title']}
+Abstract:
+{paper['abstract']}
+------------------------------------
+"""
+
+
+def pack_blocks(blocks, budget=CHUNK_TOKEN_BUDGET):
+
+    # Greedily fill chunks with whole blocks; only a block that is too big
+    # on its own gets shortened
+
+    chunks = []
+    current = ""
+
+    for block in blocks:
+
+        block = truncate_to_tokens(block, budget)
+
+        if current and count_tokens(current + block) > budget:
+            chunks.append(current)
+            current = ""
+
+        current += block
+
+    if current:
+        chunks.append(current)
+
+    return chunks
+
+
+def pack_papers(papers, budget=CHUNK_TOKEN_BUDGET):
+
+    return pack_blocks(
+        [format_paper(i, paper) for i, paper in enumerate(papers)],
+        budget
+    )
+
+
+def _groq_client():
+
+    api_key = os.getenv("GROQ_API_KEY")
+
+    if not api_key:
+        return None
+
+    return Groq(api_key=api_key.strip())
+
+
+def _complete(client, prompt, max_tokens=REVIEW_MAX_TOKENS):
+
+    # Same prompt for an unchanged PubMed result set → served from disk, no Groq call
+
+    return cached_generation(
+        REVIEW_MODEL,
+        f"{PROMPT_VERSION}/{max_tokens}",
+        REVIEW_TEMPERATURE,
+        prompt,
+        lambda: _call_groq(client, prompt, max_tokens)
+    )
+
+
+def _call_groq(client, prompt, max_tokens):
+
+    with metrics.span("llm", model=REVIEW_MODEL):
 
         response = client.chat.completions.create(
 
-            model="llama-3.3-70b-versatile",
+            model=REVIEW_MODEL,
 
             messages=[
                 {
@@ -158,14 +474,270 @@ PubMed Papers:
                 }
             ],
 
-            temperature=0.2,
+            temperature=REVIEW_TEMPERATURE,
 
-            max_tokens=1800
+            max_tokens=max_tokens
 
         )
 
-        return response.choices[0].message.content
+    return response.choices[0].message.content
+
+
+def _summarize_chunks(client, gene_symbol, chunks):
+
+    # Map step: one Groq call per chunk, MAX_PARALLEL_CALLS at a time
+
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_CALLS) as pool:
+
+        return list(
+            pool.map(
+                lambda chunk: _complete(
+                    client,
+                    CHUNK_PROMPT.format(gene_symbol=gene_symbol, literature=chunk),
+                    CHUNK_SUMMARY_TOKENS
+                ),
+                chunks
+            )
+        )
+
+
+def _final_prompt(client, gene_symbol, papers):
+
+    # The prompt for the last (user-visible) call; any map/reduce rounds run here
+
+    chunks = pack_papers(papers)
+
+    # Everything fits: a single call, as before
+    if len(chunks) == 1:
+        return REVIEW_PROMPT.format(gene_symbol=gene_symbol, literature=chunks[0])
+
+    # Map: summarize every chunk concurrently, so no paper is dropped
+    summaries = _summarize_chunks(client, gene_symbol, chunks)
+
+    # Reduce: merge the summaries, in more rounds if they still overflow one prompt
+    notes = [
+        f"\nBatch {i+1} summary:\n{summary}\n"
+        for i, summary in enumerate(summaries)
+    ]
+    merged = pack_blocks(notes)
+
+    while len(merged) > 1:
+        notes = _summarize_chunks(client, gene_symbol, merged)
+        merged = pack_blocks(notes)
+
+    return MERGE_PROMPT.format(gene_symbol=gene_symbol, literature=merged[0])
+
+
+def generate_literature_review(gene_symbol, papers=None):
+
+    if papers is None:
+        papers = fetch_pubmed_abstracts(gene_symbol)
+
+    if len(papers) == 0:
+        return "No PubMed papers found."
+
+    client = _groq_client()
+
+    if client is None:
+        return "❌ GROQ_API_KEY not found."
+
+    try:
+
+        return _complete(
+            client,
+            _final_prompt(client, gene_symbol, papers)
+        )
 
     except Exception as e:
 
         return f"Groq Error:\n\n{e}"
+
+
+def _stream_complete(client, prompt, max_tokens=REVIEW_MAX_TOKENS):
+
+    # Like _complete, but yields tokens as Groq produces them;
+    # the finished text goes into the same cache entry
+
+    template_version = f"{PROMPT_VERSION}/{max_tokens}"
+    key = generation_key(REVIEW_MODEL, template_version, REVIEW_TEMPERATURE, prompt)
+    store = get_summary_store()
+
+    entry = store.get(key)
+
+    if entry is not None:
+        yield entry[1]
+        return
+
+    stream = client.chat.completions.create(
+
+        model=REVIEW_MODEL,
+
+        messages=[
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+
+        temperature=REVIEW_TEMPERATURE,
+
+        max_tokens=max_tokens,
+
+        stream=True
+
+    )
+
+    parts = []
+
+    for chunk in stream:
+
+        delta = chunk.choices[0].delta.content
+
+        if delta:
+            parts.append(delta)
+            yield delta
+
+    store.set(key, "".join(parts))
+
+
+def stream_literature_review(gene_symbol, papers=None):
+
+    # Generator version of generate_literature_review for st.write_stream:
+    # text starts arriving as soon as the final call begins
+
+    if papers is None:
+        papers = fetch_pubmed_abstracts(gene_symbol)
+
+    if len(papers) == 0:
+        yield "No PubMed papers found."
+        return
+
+    client = _groq_client()
+
+    if client is None:
+        yield "❌ GROQ_API_KEY not found."
+        return
+
+    try:
+
+        yield from _stream_complete(
+            client,
+            _final_prompt(client, gene_symbol, papers)
+        )
+
+    except Exception as e:
+
+        yield f"Groq Error:\n\n{e}"
+
+
+
+# ---------------------------------------------------
+# Local abstract summaries
+# ---------------------------------------------------
+
+SUMMARY_MODEL = os.getenv(
+    "G2T_SUMMARY_MODEL",
+    "sshleifer/distilbart-cnn-12-6"
+)
+
+SUMMARY_BATCH_SIZE = 8
+SUMMARY_MAX_LENGTH = 130
+SUMMARY_MIN_LENGTH = 30
+SUMMARY_VERSION = f"{SUMMARY_MIN_LENGTH}-{SUMMARY_MAX_LENGTH}"
+
+_local_summarizer = None
+_local_summarizer_lock = threading.Lock()
+
+
+def get_local_summarizer():
+
+    # transformers/torch are imported and the model loaded on first use only,
+    # then kept for the life of the process
+
+    global _local_summarizer
+
+    with _local_summarizer_lock:
+
+        if _local_summarizer is None:
+
+            from transformers import pipeline
+
+            _local_summarizer = pipeline(
+                "summarization",
+                model=SUMMARY_MODEL,
+                device=-1
+            )
+
+        return _local_summarizer
+
+
+def iter_summaries(texts, batch_size=SUMMARY_BATCH_SIZE):
+
+    # Yields (index, summary) pairs as they become available: cached and
+    # short texts first, then every pipeline batch as soon as it finishes
+
+    store = get_summary_store()
+
+    todo = []
+
+    for i, text in enumerate(texts):
+
+        if len(text.split()) <= SUMMARY_MIN_LENGTH:
+            yield i, text
+            continue
+
+        entry = store.get(
+            generation_key(SUMMARY_MODEL, SUMMARY_VERSION, 0, text)
+        )
+
+        if entry is not None:
+            yield i, entry[1]
+        else:
+            todo.append(i)
+
+    if not todo:
+        return
+
+    summarizer = get_local_summarizer()
+
+    for start in range(0, len(todo), batch_size):
+
+        batch = todo[start:start + batch_size]
+
+        # One padded forward pass per batch
+        with metrics.span("model", model=SUMMARY_MODEL, batch=len(batch)):
+
+            outputs = summarizer(
+                [texts[i] for i in batch],
+                batch_size=batch_size,
+                truncation=True,
+                max_length=SUMMARY_MAX_LENGTH,
+                min_length=SUMMARY_MIN_LENGTH,
+                do_sample=False
+            )
+
+        for i, output in zip(batch, outputs):
+
+            summary = output["summary_text"]
+
+            store.set(
+                generation_key(SUMMARY_MODEL, SUMMARY_VERSION, 0, texts[i]),
+                summary
+            )
+
+            yield i, summary
+
+
+def summarize_batch(texts, batch_size=SUMMARY_BATCH_SIZE):
+
+    summaries = [None] * len(texts)
+
+    for i, summary in iter_summaries(texts, batch_size):
+        summaries[i] = summary
+
+    return summaries
+
+
+def summarize_text(text):
+
+    return summarize_batch([text])[0]
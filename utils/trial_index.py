@@ -0,0 +1,245 @@
+# 📁 utils/trial_index.py
+"""Local ClinicalTrials.gov index built from a bulk JSON export.
+
+    python -m utils.trial_index build ctg-studies.json.zip --db trials.sqlite
+    python -m utils.trial_index update delta.jsonl --db trials.sqlite
+
+The export can be the zip of per-study JSON files offered by ClinicalTrials.gov,
+a JSON array, or JSON lines of v2 study objects. Delta files use the same
+formats; a line like {"nctId": "NCT...", "deleted": true} removes a study.
+Point G2T_TRIAL_INDEX at the file and the Clinical Trials tab searches it
+instead of the live API.
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import zipfile
+
+from utils.records import Trial
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS studies (
+    nct_id TEXT PRIMARY KEY, title TEXT, condition TEXT, sponsor TEXT,
+    overall_status TEXT, interventions TEXT, keywords TEXT
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL, nct_id TEXT NOT NULL, PRIMARY KEY (term, nct_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_nct ON postings (nct_id);
+CREATE INDEX IF NOT EXISTS studies_status ON studies (overall_status);
+"""
+
+# Fields whose words go into the inverted index
+INDEXED_FIELDS = ["title", "condition", "interventions", "keywords"]
+
+COMMIT_EVERY = 5000
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return set(_TOKEN.findall((text or "").lower()))
+
+
+def study_record(study):
+    """The parse_study() record plus the keywords the index also searches on."""
+    from utils.trials import parse_study  # utils.trials imports this module
+
+    record = parse_study(study).as_dict()
+    pf = study.get("protocolSection", {})
+    record["keywords"] = ", ".join(pf.get("conditionsModule", {}).get("keywords", []))
+    return record
+
+
+# ---------------------------------------------------
+# Reading exports
+# ---------------------------------------------------
+
+def iter_export(path):
+    """Yield study objects from a zip export, a JSON array or JSON lines."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                if name.endswith(".json"):
+                    with archive.open(name) as f:
+                        data = json.load(f)
+                    yield from data if isinstance(data, list) else [data]
+        return
+
+    with open(path, encoding="utf-8") as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == "[":
+            yield from json.load(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+# ---------------------------------------------------
+# Building / updating
+# ---------------------------------------------------
+
+def _connect(db_path):
+    db = sqlite3.connect(db_path)
+    db.executescript(SCHEMA)
+    return db
+
+
+def _remove(db, nct_id):
+    db.execute("DELETE FROM postings WHERE nct_id = ?", (nct_id,))
+    db.execute("DELETE FROM studies WHERE nct_id = ?", (nct_id,))
+
+
+def _upsert(db, record):
+    nct_id = record["nct_id"]
+    _remove(db, nct_id)
+    db.execute(
+        "INSERT INTO studies VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (nct_id, record["title"], record["condition"], record["sponsor"],
+         record["overall_status"], record["interventions"], record["keywords"])
+    )
+    terms = set()
+    for field in INDEXED_FIELDS:
+        terms |= tokenize(record[field])
+    db.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?)", ((t, nct_id) for t in terms))
+
+
+def apply_studies(db_path, studies, log=print):
+    """Insert/replace studies (and apply deletions) from an iterable of study objects."""
+    db = _connect(db_path)
+    added = removed = 0
+    for study in studies:
+        if study.get("deleted"):
+            _remove(db, study.get("nctId", ""))
+            removed += 1
+            continue
+        record = study_record(study)
+        if not record["nct_id"]:
+            continue
+        _upsert(db, record)
+        added += 1
+        if added % COMMIT_EVERY == 0:
+            db.commit()
+            log(f"{added} studies indexed")
+    db.commit()
+    db.close()
+    return added, removed
+
+
+def build(db_path, export_path, log=print):
+    """Index a full export from scratch.
+
+    The index is built next to db_path and only moved over it once complete,
+    so a failed or interrupted build leaves the previous index in place.
+    """
+    fd, building = tempfile.mkstemp(
+        prefix=os.path.basename(db_path) + ".", suffix=".building", dir=os.path.dirname(os.path.abspath(db_path))
+    )
+    os.close(fd)
+    try:
+        counts = apply_studies(building, iter_export(export_path), log)
+        os.replace(building, db_path)
+    except BaseException:
+        os.remove(building)
+        raise
+    return counts
+
+
+def update(db_path, delta_path, log=print):
+    """Apply a delta export on top of an existing index."""
+    return apply_studies(db_path, iter_export(delta_path), log)
+
+
+# ---------------------------------------------------
+# Searching
+# ---------------------------------------------------
+
+class TrialIndex:
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _db(self):
+        if not hasattr(self._local, "db"):
+            self._local.db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        return self._local.db
+
+    def search(self, query, statuses=None, sponsor=None, limit=None):
+        """Studies containing every word of `query`, optionally filtered by status and sponsor.
+
+        Returns records shaped like fetch_clinical_trials() results.
+        """
+        terms = sorted(tokenize(query))
+        if not terms:
+            return []
+
+        # Intersect posting lists: one self-join per extra term, all on the (term, nct_id) key
+        sql = (
+            "SELECT s.nct_id, s.title, s.condition, s.sponsor, s.overall_status, s.interventions "
+            "FROM postings p0"
+        )
+        params = []
+        for i, term in enumerate(terms[1:], 1):
+            sql += f" JOIN postings p{i} ON p{i}.nct_id = p0.nct_id AND p{i}.term = ?"
+            params.append(term)
+        sql += " JOIN studies s ON s.nct_id = p0.nct_id WHERE p0.term = ?"
+        params.append(terms[0])
+
+        if statuses:
+            sql += f" AND s.overall_status IN ({', '.join('?' * len(statuses))})"
+            params.extend(s.upper() for s in statuses)
+        if sponsor:
+            sql += " AND s.sponsor LIKE ?"
+            params.append(f"%{sponsor}%")
+
+        sql += " ORDER BY s.nct_id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        return [
+            Trial(*row) for row in self._db().execute(sql, params)
+        ]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_trial_index():
+    """The index configured by G2T_TRIAL_INDEX, or None when running against the live API."""
+    global _index
+    path = os.getenv("G2T_TRIAL_INDEX")
+    if not path or not os.path.exists(path):
+        return None
+    with _index_lock:
+        if _index is None or _index.path != path:
+            _index = TrialIndex(path)
+        return _index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or update the local clinical trial index.")
+    parser.add_argument("command", choices=["build", "update"])
+    parser.add_argument("export", help="bulk export (zip, JSON array or JSON lines) or delta file")
+    parser.add_argument("--db", default="trials.sqlite", help="index file")
+    args = parser.parse_args(argv)
+
+    action = build if args.command == "build" else update
+    added, removed = action(args.db, args.export)
+    print(f"{added} studies indexed, {removed} removed.")
+    if args.command == "build":
+        print(f"Set G2T_TRIAL_INDEX={os.path.abspath(args.db)} to use it.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,199 @@
-import requests
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import async_http, http_client, metrics
+from utils.cache import cache_key, cached, cached_async, get_cache, not_error_message
+from utils.records import Trial, to_frame
+from utils.trial_index import get_trial_index
 import streamlit as st
 
-def fetch_clinical_trials(gene_symbol, page_size=20):
-    url = "https://clinicaltrials.gov/api/v2/studies"
+STUDIES_URL = "https://clinicaltrials.gov/api/v2/studies"
+STUDY_FIELDS = (
+    "protocolSection.identificationModule.nctId,"
+    "protocolSection.identificationModule.briefTitle,"
+    "protocolSection.conditionsModule.conditions,"
+    "protocolSection.sponsorCollaboratorsModule.leadSponsor.name,"
+    "protocolSection.statusModule.overallStatus,"
+    "protocolSection.armsInterventionsModule.interventions.name"
+)
+
+PAGE_SIZE = 100
+MAX_TRIALS = 1000  # keeps genes with thousands of trials bounded in memory
+
+_prefetcher = ThreadPoolExecutor(max_workers=4, thread_name_prefix="trial-pages")
+
+
+def parse_study(study):
+    """Flatten one v2 study into a Trial record."""
+    pf = study.get("protocolSection", {})
+    id_mod = pf.get("identificationModule", {})
+    cond_mod = pf.get("conditionsModule", {})
+    stat_mod = pf.get("statusModule", {})
+    sponsor_mod = pf.get("sponsorCollaboratorsModule", {}).get("leadSponsor", {})
+    interventions = pf.get("armsInterventionsModule", {}).get("interventions", [])
+
+    return Trial(
+        nct_id=id_mod.get("nctId", ""),
+        title=id_mod.get("briefTitle", ""),
+        condition=", ".join(cond_mod.get("conditions", [])),
+        sponsor=sponsor_mod.get("name", ""),
+        overall_status=stat_mod.get("overallStatus", "N/A"),
+        interventions=", ".join(i.get("name", "") for i in interventions if i.get("name"))
+    )
+
+
+def trial_page_params(gene_symbol, page_size, page_token=None):
     params = {
         "query.term": gene_symbol,
-        "fields": (
-            "protocolSection.identificationModule.nctId,"
-            "protocolSection.identificationModule.briefTitle,"
-            "protocolSection.conditionsModule.conditions,"
-            "protocolSection.sponsorCollaboratorsModule.leadSponsor.name,"
-            "protocolSection.statusModule.overallStatus"
-        ),
+        "fields": STUDY_FIELDS,
         "pageSize": page_size
     }
+    if page_token:
+        params["pageToken"] = page_token
+    return params
+
+
+def parse_trial_page(resp):
+    """(studies, nextPageToken) from one /studies response."""
+    resp.raise_for_status()
+    with metrics.span("parse"):
+        data = resp.json()
+    return data.get("studies", []), data.get("nextPageToken")
+
+
+def fetch_trial_page(gene_symbol, page_size, page_token=None):
+    """Fetch one page of studies: returns (studies, nextPageToken)."""
+    return parse_trial_page(http_client.get(STUDIES_URL, params=trial_page_params(gene_symbol, page_size, page_token)))
+
+
+async def fetch_trial_page_async(gene_symbol, page_size, page_token=None):
+    params = trial_page_params(gene_symbol, page_size, page_token)
+    return parse_trial_page(await async_http.get(STUDIES_URL, params=params))
+
+
+def iter_trial_pages(gene_symbol, page_size=PAGE_SIZE, max_records=MAX_TRIALS, prefetch=True):
+    """Yield parsed trial records one page at a time, following nextPageToken.
+
+    As soon as a page arrives the request for the next one is sent, so at most
+    one page is in flight while the current one is parsed and rendered.
+    Stops after `max_records` records.
+    """
+    remaining = max_records
+    page = _prefetcher.submit(metrics.propagate(fetch_trial_page), gene_symbol, min(page_size, remaining))
+
+    while page is not None and remaining > 0:
+        studies, token = page.result()
+        studies = studies[:remaining]
+        remaining -= len(studies)
+
+        page = None
+        if token and remaining > 0:
+            size = min(page_size, remaining)
+            if prefetch:
+                page = _prefetcher.submit(metrics.propagate(fetch_trial_page), gene_symbol, size, token)
+
+        with metrics.span("build"):
+            records = [parse_study(study) for study in studies]
+        yield records
+
+        if token and remaining > 0 and not prefetch:
+            page = _prefetcher.submit(metrics.propagate(fetch_trial_page), gene_symbol, size, token)
+
+
+def filter_trials(trials, statuses=None, sponsor=None):
+    """Trials with one of `statuses` and a lead sponsor containing `sponsor`, matched
+    case-insensitively like TrialIndex.search."""
+    if statuses:
+        wanted = {status.upper() for status in statuses}
+        trials = [t for t in trials if (t.overall_status or "").upper() in wanted]
+    if sponsor:
+        sponsor = sponsor.lower()
+        trials = [t for t in trials if sponsor in (t.sponsor or "").lower()]
+    return trials
+
+
+@cached("trials")
+def fetch_clinical_trials(gene_symbol, page_size=PAGE_SIZE, max_records=MAX_TRIALS,
+                          statuses=None, sponsor=None):
+    """All trials for a gene (up to max_records), optionally filtered by status and sponsor.
+
+    The local index filters in its query; against the API the filters apply to
+    the first max_records trials fetched.
+    """
     try:
-        resp = requests.get(url, params=params)
-        resp.raise_for_status()
-        studies = resp.json().get("studies", [])
+        index = get_trial_index()
+        if index:
+            return index.search(gene_symbol, statuses=statuses, sponsor=sponsor, limit=max_records)
+
         results = []
-        for study in studies:
-            pf = study.get("protocolSection", {})
-            id_mod = pf.get("identificationModule", {})
-            cond_mod = pf.get("conditionsModule", {})
-            stat_mod = pf.get("statusModule", {})
-            sponsor_mod = pf.get("sponsorCollaboratorsModule", {}).get("leadSponsor", {})
-
-            results.append({
-                "nct_id": id_mod.get("nctId", ""),
-                "title": id_mod.get("briefTitle", ""),
-                "condition": ", ".join(cond_mod.get("conditions", [])),
-                "sponsor": sponsor_mod.get("name", ""),
-                "overall_status": stat_mod.get("overallStatus", "N/A")
-            })
+        for page in iter_trial_pages(gene_symbol, page_size, max_records):
+            results.extend(filter_trials(page, statuses, sponsor))
         return results
     except Exception as e:
+        metrics.error(type(e).__name__)
+        return f"Error fetching trials: {e}"
+
+
+@cached_async("trials")
+async def fetch_clinical_trials_async(gene_symbol, page_size=PAGE_SIZE, max_records=MAX_TRIALS,
+                                      statuses=None, sponsor=None):
+    """fetch_clinical_trials without a thread per request.
+
+    Page tokens only come with the previous page, so pages are fetched in
+    turn; the concurrency is across genes.
+    """
+    try:
+        index = get_trial_index()
+        if index:
+            return index.search(gene_symbol, statuses=statuses, sponsor=sponsor, limit=max_records)
+
+        results = []
+        token = None
+        while len(results) < max_records:
+            studies, token = await fetch_trial_page_async(
+                gene_symbol, min(page_size, max_records - len(results)), token
+            )
+            with metrics.span("build"):
+                results.extend(parse_study(study) for study in studies[:max_records - len(results)])
+            if not token or not studies:
+                break
+        return filter_trials(results, statuses, sponsor)
+    except Exception as e:
+        metrics.error(type(e).__name__)
         return f"Error fetching trials: {e}"
 
-        
+
+def open_trial_stream(gene_symbol):
+    """Fetch the first page now and return (first_page, iterator over the remaining pages).
+
+    Shares the cache entry of fetch_clinical_trials(gene_symbol): a cached list is
+    returned whole, and a stream that runs to the end is stored for next time.
+    """
+    # A local index answers in one go
+    index = get_trial_index()
+    if index:
+        return index.search(gene_symbol, limit=MAX_TRIALS), iter(())
+
+    cache = get_cache()
+    key = cache_key("trials", gene_symbol)
+    trials = cache.peek(
+        "trials", key, refresh=lambda: fetch_clinical_trials.uncached(gene_symbol), store_if=not_error_message
+    )
+    if trials is not None:
+        return trials, iter(())
+
+    pages = iter_trial_pages(gene_symbol)
+    first = next(pages, [])
+
+    def rest():
+        collected = list(first)
+        for page in pages:
+            collected.extend(page)
+            yield page
+        cache.put(key, collected)
+
+    return first, rest()
+
+
 def status_badge(status):
     """Return emoji badge for clinical trial status"""
     s = status.lower()
@@ -51,19 +206,8 @@ def status_badge(status):
     else:
         return "⚪ " + status
 
-def render_trials_ui(gene_symbol: str):
-    """Render clinical trials in Streamlit"""
-    trials = fetch_clinical_trials(gene_symbol, page_size=15)
-
-    if isinstance(trials, str):
-        st.error(trials)
-        return
-    
-    if not trials:
-        st.warning("⚠️ No clinical trials found for this gene.")
-        return
-
-    df = pd.DataFrame(trials)
+def _trials_table(trials):
+    df = to_frame(trials, Trial)
     df["NCT ID"] = df["nct_id"].apply(
         lambda x: f'<a href="https://clinicaltrials.gov/study/{x}" target="_blank">{x}</a>' if x else ""
     )
@@ -78,13 +222,64 @@ def render_trials_ui(gene_symbol: str):
         "sponsor": "Sponsor",
         "overall_status": "Status"
     })
+    return df
+
+
+def render_trials_ui(gene_symbol: str, trials=None, more_pages=None, defer=False):
+    """Render clinical trials in Streamlit.
+
+    Without `trials` the first page is fetched here. Pages from `more_pages` are
+    appended to the same table as they arrive; with `defer=True` that loading is
+    returned as a callable instead, so the caller can render other things first.
+    """
+    if trials is None:
+        try:
+            trials, more_pages = open_trial_stream(gene_symbol)
+        except Exception as e:
+            trials = f"Error fetching trials: {e}"
+
+    if isinstance(trials, str):
+        st.error(trials)
+        return
+    
+    if not trials:
+        st.warning("⚠️ No clinical trials found for this gene.")
+        return
+
+    trials = list(trials)
+    status = st.empty()
+    table = st.empty()
+    download = st.empty()
+
+    def show():
+        df = _trials_table(trials)
+        df_display = df[["NCT ID", "Title", "Condition", "Sponsor", "Status"]]
+        table.write(df_display.to_html(escape=False, index=False), unsafe_allow_html=True)
+        return df
+
+    show()
+
+    def load_rest():
+        df = None
+        try:
+            for page in more_pages or ():
+                trials.extend(page)
+                status.caption(f"⏳ Loaded {len(trials)} trials, fetching more...")
+                df = show()
+            status.empty()
+        except Exception as e:
+            status.error(f"Error fetching more trials: {e}")
+
+        #st.dataframe(df, use_container_width=True)
+        download.download_button(
+            label="📥 Download Trials CSV",
+            data=(df if df is not None else _trials_table(trials)).to_csv(index=False).encode("utf-8"),
+            file_name=f"{gene_symbol}_trials.csv",
+            mime="text/csv")
 
-    df_display = df[["NCT ID", "Title", "Condition", "Sponsor", "Status"]]
-    st.write(df_display.to_html(escape=False, index=False), unsafe_allow_html=True)
+    if more_pages is not None:
+        status.caption(f"⏳ Loaded {len(trials)} trials, fetching more...")
 
-    #st.dataframe(df, use_container_width=True)
-    st.download_button(
-        label="📥 Download Trials CSV",
-        data=df.to_csv(index=False).encode("utf-8"),
-        file_name=f"{gene_symbol}_trials.csv",
-        mime="text/csv")
+    if defer:
+        return load_rest
+    load_rest()